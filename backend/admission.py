@@ -0,0 +1,145 @@
+# Admission control: bounded in-flight pipelines with a priority wait queue
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+
+from backend import config
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; `retry_after` is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limits concurrent pipelines and queues the excess by priority.
+
+    When all slots are taken, requests wait in a heap ordered by priority
+    then arrival. A request is rejected with Overloaded when `max_queue`
+    requests of the same or higher priority are already waiting (so queued
+    batch work never crowds out interactive requests) or when it has waited
+    `queue_timeout` seconds.
+
+    Args:
+        max_in_flight: Concurrent pipelines (0 = unlimited)
+        max_queue: Waiting requests per priority level and above
+        queue_timeout: Longest a request may wait for a slot
+        degrade_load: Load (in-flight + queued, relative to max_in_flight) at
+            which `degraded` turns on
+    """
+
+    def __init__(self, max_in_flight: int = None, max_queue: int = None, queue_timeout: float = None,
+                 degrade_load: float = None):
+        self.max_in_flight = config.ADMISSION_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        self.max_queue = config.ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout or config.ADMISSION_QUEUE_TIMEOUT
+        self.degrade_load = degrade_load or config.ADMISSION_DEGRADE_LOAD
+        self.in_flight = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._avg_hold = 2.0  # EWMA of seconds a slot is held, for Retry-After
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "degraded": 0}
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def load(self) -> float:
+        if not self.max_in_flight:
+            return 0.0
+        return (self.in_flight + self.queued) / self.max_in_flight
+
+    @property
+    def degraded(self) -> bool:
+        """True when load is high enough that callers should prefer cheaper strategies."""
+        return bool(self.max_in_flight) and self.load() >= self.degrade_load
+
+    def retry_after(self, ahead: int = None) -> int:
+        """Rough seconds until a slot frees up for a request behind `ahead` others."""
+        ahead = self.queued if ahead is None else ahead
+        waves = (ahead + 1) / max(self.max_in_flight, 1)
+        return max(1, min(60, math.ceil(self._avg_hold * waves)))
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, bounded: bool = True) -> float:
+        """
+        Wait for a pipeline slot.
+
+        Args:
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            bounded: If False, never reject for a full queue (callers that
+                already limit their own concurrency, e.g. batch runs)
+
+        Returns:
+            Acquisition time, to be passed back to release()
+
+        Raises:
+            Overloaded: The queue is full or the wait timed out
+        """
+        if not self.max_in_flight or (self.in_flight < self.max_in_flight and not self.queued):
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return time.monotonic()
+
+        ahead = sum(1 for p, _, future in self._waiters if p <= priority and not future.done())
+        if bounded and ahead >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise Overloaded(self.retry_after(ahead))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self.counters["timed_out"] += 1
+                raise Overloaded(self.retry_after())
+        except BaseException:
+            # Cancelled while waiting: give back a slot that was handed over meanwhile
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            else:
+                future.cancel()
+            raise
+        self.counters["admitted"] += 1
+        return time.monotonic()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, bounded: bool = True):
+        """acquire() and release() around a block."""
+        acquired_at = await self.acquire(priority, bounded)
+        try:
+            yield
+        finally:
+            self.release(acquired_at)
+
+    def release(self, acquired_at: float):
+        """Return a slot, handing it straight to the next waiter if there is one."""
+        self._avg_hold = 0.9 * self._avg_hold + 0.1 * (time.monotonic() - acquired_at)
+        self._release_slot()
+
+    def _release_slot(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # slot transfers without touching in_flight
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": self.in_flight, "waiting": self.queued,
+                "max_in_flight": self.max_in_flight, "load": round(self.load(), 3),
+                "degraded_now": self.degraded, "avg_hold_seconds": round(self._avg_hold, 3)}
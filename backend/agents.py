@@ -1,20 +1,34 @@
 # ALL agents in one file
 
+import asyncio
+from typing import Callable, List
+
+from backend import config
+from backend.fetch import PageFetcher, get_fetcher
+from backend.ingest import chunk_text
 from backend.state import AgentState
-from backend.tools import search_web, call_llm, call_llm_stream
-from backend.memory import Memory
+from backend.tools import reformulate_query, search_web_many
+from backend.llm import acall_llm, acall_llm_stream
+from backend.memory import Memory, get_memory
+from backend.router import QueryRouter
+from backend.speculation import SpeculativeSearch, get_speculator
 
 class ManagerAgent:
-    def __init__(self):
+    def __init__(self, memory: Memory = None, router: QueryRouter = None,
+                 speculator: SpeculativeSearch = None, degraded: Callable[[], bool] = None):
         try:
-            self.memory = Memory()
+            self.memory = memory or get_memory()
             self.memory_available = True
         except Exception as e:
             print(f"Memory initialization failed: {e}")
             self.memory = None
             self.memory_available = False
+        self.router = router or QueryRouter(self.memory)
+        self.speculator = speculator or get_speculator()
+        # Reports whether the server is under load (see backend.admission)
+        self.degraded = degraded or (lambda: False)
     
-    def classify_query(self, query: str) -> str:
+    async def classify_query(self, query: str) -> str:
         prompt = f"""
         Classify the user query into ONE of the following categories:
 
@@ -28,25 +42,91 @@ class ManagerAgent:
         Query: "{query}"
         """
 
-        strategy = call_llm(prompt).strip().lower()
+        strategy = (await acall_llm(prompt)).strip().lower()
         return strategy
 
-    def run(self, state: AgentState) -> AgentState:
+    async def run(self, state: AgentState) -> AgentState:
         query = state["query"]
 
-        # Check if we have relevant memory (only if memory is available)
-        memory_hits = []
-        if self.memory_available:
+        # Start the web search now so it overlaps with planning; adopted or discarded below.
+        # It covers the same reformulations the plan will ask for.
+        token = None
+        if config.SPECULATIVE_SEARCH and not self.degraded():
+            token = self.speculator.start([query] + reformulate_query(query))
+        try:
+            return await self._plan(state, token)
+        except BaseException:
+            if token:
+                self.speculator.discard(token)
+            raise
+
+    async def plan_many(self, states: List[AgentState], embeddings: list = None, concurrency: int = None,
+                        slot: Callable = None) -> List[AgentState]:
+        """
+        Plan several queries together: one embedding batch and one memory
+        query for all of them; only the LLM classifications run per query.
+
+        Args:
+            states: Fresh states, one per query
+            embeddings: Query embeddings if the caller already computed them
+            concurrency: Queries classified at once (default: all)
+            slot: Zero-argument callable returning an async context manager
+                held around each query's planning (e.g. a batch-priority
+                admission slot, so classifications queue behind interactive work)
+
+        Returns:
+            The same states with their plan filled in
+        """
+        queries = [state["query"] for state in states]
+        hits = [[] for _ in queries]
+        if self.memory_available and queries:
             try:
-                memory_hits = self.memory.search(query, k=3)
+                if embeddings is None:
+                    embeddings = await asyncio.to_thread(self.memory.embed_queries, queries)
+                hits = await asyncio.to_thread(self.memory.search_many, queries, 3)
             except Exception as e:
-                print(f"Memory search failed: {e}")
-                memory_hits = []
+                print(f"Batch memory search failed: {e}")
+        if embeddings is None:
+            embeddings = [None] * len(queries)
+        semaphore = asyncio.Semaphore(concurrency or max(len(states), 1))
+
+        async def plan_one(state, memory_hits, embedding):
+            async with semaphore:
+                if slot is None:
+                    return await self._plan(state, memory_hits=memory_hits, embedding=embedding)
+                async with slot():
+                    return await self._plan(state, memory_hits=memory_hits, embedding=embedding)
+
+        return await asyncio.gather(*(
+            plan_one(state, memory_hits, embedding)
+            for state, memory_hits, embedding in zip(states, hits, embeddings)
+        ))
+
+    async def _plan(self, state: AgentState, token: str = None, memory_hits: list = None,
+                    embedding=None) -> AgentState:
+        query = state["query"]
+
+        # Check if we have relevant memory (only if memory is available)
+        if memory_hits is None:
+            memory_hits = []
+            if self.memory_available:
+                try:
+                    memory_hits = await asyncio.to_thread(self.memory.search, query, k=3)
+                except Exception as e:
+                    print(f"Memory search failed: {e}")
+                    memory_hits = []
 
         if memory_hits and len(memory_hits) > 0:
             strategy = "hybrid"  # Use hybrid if we have memory
         else:
-            strategy = self.classify_query(query)
+            # Confident cases are routed locally; only ambiguous queries pay for the LLM call
+            strategy, source = None, "llm"
+            if config.ROUTER_ENABLED:
+                strategy, source = await asyncio.to_thread(self.router.route, query, embedding)
+            if strategy is None:
+                strategy = await self.classify_query(query)
+                self.router.record_llm(strategy)
+            state["logs"].append(f"ManagerAgent routed query via {source}.")
 
         # Validate strategy
         if strategy not in ["direct_answer", "web_research", "memory_retrieval", "hybrid"]:
@@ -55,14 +135,30 @@ class ManagerAgent:
         # If memory not available, fallback to web_research
         if not self.memory_available and strategy in ["memory_retrieval", "hybrid"]:
             strategy = "web_research"
+
+        # Under load, answer from memory when it has anything instead of searching the web again
+        degraded = bool(memory_hits) and strategy in ["web_research", "hybrid"] and self.degraded()
+        if degraded:
+            strategy = "memory_retrieval"
+            state["logs"].append("ManagerAgent: Server under load, skipping web research.")
         
         state["plan"] = {"strategy": strategy}
+        if strategy in ["web_research", "hybrid"]:
+            # Searched concurrently with the query itself and merged (see search_web_many)
+            state["plan"]["queries"] = reformulate_query(query)
+        if degraded:
+            state["plan"]["degraded"] = True
+        if token:
+            if strategy in ["web_research", "hybrid"]:
+                state["plan"]["speculative_search"] = token
+            else:
+                self.speculator.discard(token)
         state["logs"].append(f"ManagerAgent decided strategy: {strategy}")
         return state
 
         
 class ValidationAgent:
-    def run(self, state: AgentState) -> AgentState:
+    async def run(self, state: AgentState) -> AgentState:
         if not state["research_results"]:
             state["validated_results"] = []
             state["logs"].append("ValidationAgent: No results to validate.")
@@ -81,7 +177,7 @@ class ValidationAgent:
                     {validated_result}
                     """
 
-        validated_result = call_llm(prompt)
+        validated_result = await acall_llm(prompt)
         
         # Convert LLM output into list
         state["validated_results"] = [
@@ -91,20 +187,110 @@ class ValidationAgent:
         return state
 
 class ResearchAgent:
-    def __init__(self):
+    def __init__(self, memory: Memory = None, speculator: SpeculativeSearch = None,
+                 fetcher: PageFetcher = None, deep: bool = None):
         try:
-            self.memory = Memory()
+            self.memory = memory or get_memory()
             self.memory_available = True
         except Exception as e:
             print(f"Memory initialization failed: {e}")
             self.memory = None
             self.memory_available = False
+        self.speculator = speculator or get_speculator()
+        # Deep research: fetch result pages and work from their text, not just snippets
+        self.deep = config.DEEP_RESEARCH if deep is None else deep
+        self.fetcher = fetcher or get_fetcher()
     
-    def run(self, state: AgentState) -> AgentState:
+    async def prefetch(self, states: List[AgentState]):
+        """
+        Warm the memory search cache for planned memory_retrieval queries
+        with a single multi-query Chroma call (used by batch runs).
+        """
+        queries = [s["query"] for s in states if s["plan"].get("strategy") == "memory_retrieval"]
+        if self.memory_available and queries:
+            try:
+                await asyncio.to_thread(self.memory.search_many, queries, 5)
+            except Exception as e:
+                print(f"Batch memory prefetch failed: {e}")
+
+    async def _memory_search(self, query: str, k: int):
+        """Memory hits within the memory deadline; None if the search failed or timed out."""
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self.memory.search, query, k=k),
+                timeout=config.MEMORY_DEADLINE,
+            )
+        except Exception:
+            return None
+
+    async def _web_search(self, queries: List[str], max_results: int, speculative: asyncio.Task = None):
+        """Deduplicated web result records within the web deadline; None if the search failed or timed out."""
+        try:
+            if speculative is not None:
+                records = await asyncio.wait_for(speculative, timeout=config.WEB_DEADLINE)
+                return records[:max_results]
+            records = await asyncio.wait_for(
+                asyncio.to_thread(search_web_many, queries, max_results=max_results),
+                timeout=config.WEB_DEADLINE,
+            )
+            # Interleaved across reformulations, so the top records mix all of them
+            return records[:max_results]
+        except Exception:
+            return None
+
+    async def _deepen(self, state: AgentState, web_results: list) -> list:
+        """
+        Fetch the result pages concurrently and attach their text chunks as
+        `chunks` on each record that could be fetched within FETCH_DEADLINE.
+        """
+        if not self.deep or not web_results:
+            return web_results
+        pages = await self.fetcher.fetch_many([r["url"] for r in web_results])
+        deepened = []
+        for record in web_results:
+            page = pages.get(record["url"])
+            if page:
+                record = {**record, "title": record["title"] or page["title"], "chunks": chunk_text(page["text"])}
+            deepened.append(record)
+        state["logs"].append(f"ResearchAgent: Fetched {len(pages)}/{len(web_results)} result pages.")
+        return deepened
+
+    @staticmethod
+    def _texts(web_results: list) -> List[str]:
+        # Leading chunks of fetched pages, the search snippet otherwise
+        texts = []
+        for r in web_results:
+            texts.extend(r.get("chunks", [])[:config.FETCH_CHUNKS_PER_PAGE] or [r["body"]])
+        return texts
+
+    def _save_later(self, state: AgentState, web_results: list, query: str):
+        # Embedding and writing happen on the write-behind queue, off the request path
+        if self.memory_available:
+            texts, metadata = [], []
+            for r in web_results:
+                # Every chunk of a fetched page is stored (one batched embedding call); snippets otherwise
+                for i, text in enumerate(r.get("chunks") or [r["body"]]):
+                    texts.append(text)
+                    metadata.append({"url": r["url"], "title": r["title"], "chunk": i} if "chunks" in r
+                                    else {"url": r["url"], "title": r["title"]})
+            if self.memory.save_later(texts, query=query, metadata=metadata):
+                state["logs"].append(f"ResearchAgent: Queued {len(texts)} results for memory.")
+            else:
+                state["logs"].append(f"ResearchAgent: Could not save to memory.")
+
+    async def run(self, state: AgentState) -> AgentState:
         strategy = state["plan"]["strategy"]
         query = state["query"]
+        # Optional reformulations (plan["queries"]) are searched concurrently and merged
+        queries = [query] + state["plan"].get("queries", [])
         results = []
 
+        # A search the manager started speculatively for this request (over the same queries), if any
+        speculative = None
+        token = state["plan"].pop("speculative_search", None)
+        if token:
+            speculative = self.speculator.adopt(token)
+
         # Handle different strategies
         if strategy == "direct_answer":
             state["logs"].append("ResearchAgent: Skipped (direct answer).")
@@ -114,83 +300,166 @@ class ResearchAgent:
         elif strategy == "memory_retrieval":
             # Only retrieve from memory
             if self.memory_available:
-                try:
-                    memory_results = self.memory.search(query, k=5)
-                    if memory_results:
-                        results.extend(memory_results)
-                        state["logs"].append(f"ResearchAgent: Retrieved {len(memory_results)} results from memory.")
-                    else:
-                        state["logs"].append("ResearchAgent: No memory results found.")
-                except Exception as e:
+                memory_task = asyncio.create_task(self._memory_search(query, 5))
+                web_task = None
+
+                # Hedge: if memory is slow, start the web fallback instead of waiting it out
+                await asyncio.wait({memory_task}, timeout=config.MEMORY_HEDGE_DELAY)
+                if not memory_task.done():
+                    web_task = asyncio.create_task(self._web_search(queries, 5))
+                memory_results = await memory_task
+
+                if memory_results:
+                    if web_task:
+                        web_task.cancel()
+                    results.extend(memory_results)
+                    state["logs"].append(f"ResearchAgent: Retrieved {len(memory_results)} results from memory.")
+                elif memory_results is None or web_task:
                     state["logs"].append(f"ResearchAgent: Memory search failed, falling back to web.")
                     # Fallback to web search
-                    web_results = search_web(query, max_results=5)
+                    web_results = await (web_task or self._web_search(queries, 5))
                     if web_results:
-                        results.extend(web_results)
+                        results.extend(r["body"] for r in web_results)
                         state["logs"].append(f"ResearchAgent: Collected {len(web_results)} web results.")
+                else:
+                    state["logs"].append("ResearchAgent: No memory results found.")
             else:
                 state["logs"].append("ResearchAgent: Memory not available, using web search.")
-                web_results = search_web(query, max_results=5)
+                web_results = await self._web_search(queries, 5)
                 if web_results:
-                    results.extend(web_results)
+                    results.extend(r["body"] for r in web_results)
                     state["logs"].append(f"ResearchAgent: Collected {len(web_results)} web results.")
 
         elif strategy == "web_research":
             # Only web search
-            web_results = search_web(query, max_results=5)
+            web_results = await self._web_search(queries, 5, speculative)
             if web_results:
-                results.extend(web_results)
+                web_results = await self._deepen(state, web_results)
+                results.extend(self._texts(web_results))
                 state["logs"].append(f"ResearchAgent: Collected {len(web_results)} web results.")
                 
                 # Save to memory for future use (if available)
-                if self.memory_available:
-                    try:
-                        self.memory.save(web_results, query=query)
-                        state["logs"].append(f"ResearchAgent: Saved {len(web_results)} results to memory.")
-                    except Exception as e:
-                        state["logs"].append(f"ResearchAgent: Could not save to memory.")
+                self._save_later(state, web_results, query)
             else:
                 state["logs"].append("ResearchAgent: No web results found.")
 
         elif strategy == "hybrid":
-            # Both memory and web
+            # Both memory and web, concurrently; each bounded by its own deadline
             if self.memory_available:
-                try:
-                    memory_results = self.memory.search(query, k=3)
-                    if memory_results:
-                        results.extend(memory_results)
-                        state["logs"].append(f"ResearchAgent: Retrieved {len(memory_results)} results from memory.")
-                except Exception as e:
+                memory_results, web_results = await asyncio.gather(
+                    self._memory_search(query, 3),
+                    self._web_search(queries, 3, speculative),
+                )
+                if memory_results:
+                    results.extend(memory_results)
+                    state["logs"].append(f"ResearchAgent: Retrieved {len(memory_results)} results from memory.")
+                elif memory_results is None:
                     state["logs"].append(f"ResearchAgent: Memory search failed.")
-            
-            web_results = search_web(query, max_results=3)
+            else:
+                web_results = await self._web_search(queries, 3, speculative)
+
             if web_results:
-                results.extend(web_results)
+                web_results = await self._deepen(state, web_results)
+                results.extend(self._texts(web_results))
                 state["logs"].append(f"ResearchAgent: Collected {len(web_results)} web results.")
                 
                 # Save new web results to memory (if available)
-                if self.memory_available:
-                    try:
-                        self.memory.save(web_results, query=query)
-                        state["logs"].append(f"ResearchAgent: Saved {len(web_results)} results to memory.")
-                    except Exception as e:
-                        state["logs"].append(f"ResearchAgent: Could not save to memory.")
-
-        state["research_results"] = results[:5]  # Limit to 5 total results
+                self._save_later(state, web_results, query)
+
+        # With context packing enabled the packer trims by relevance/token budget instead
+        state["research_results"] = results if config.CONTEXT_PACKING else results[:5]
         return state
         
 class SummaryAgent:
-    def run(self, state: AgentState) -> AgentState:
-        validated_result = state["validated_results"]
-
-        prompt = f"""
+    @staticmethod
+    def build_prompt(validated_result) -> str:
+        return f"""
             Create a clear and short answer using the validated facts below.
             Keep it under 5 bullet points.
 
             Validated facts:
             {validated_result}
             """
-        summary = call_llm(prompt)
+
+    async def run(self, state: AgentState, on_token: Callable[[str], None] = None) -> AgentState:
+        prompt = self.build_prompt(state["validated_results"])
+
+        # Stream so callers (e.g. the SSE endpoint) can forward tokens as they arrive
+        summary = ""
+        async for chunk in acall_llm_stream(prompt):
+            summary += chunk
+            if on_token:
+                on_token(chunk)
         state["final_answer"] = summary
         state["logs"].append("Summary agent generated a final answer.")
         return state
+
+class ValidateSummarizeAgent:
+    """Validation and summary in one streamed LLM call (PIPELINE_MODE=single_pass)."""
+
+    ANSWER_MARKER = "ANSWER:"
+
+    @staticmethod
+    def build_prompt(information: str, query: str) -> str:
+        return f"""
+            Validate the following information, then answer the user's question.
+
+            Question:
+            {query}
+
+            First write "FACTS:" followed by 3-5 concise verified facts.
+            Rules for facts:
+            - No explanations
+            - No repetition
+            - Each point must be one sentence
+            - Output as bullet points
+
+            Then write "ANSWER:" followed by a clear and short answer to the question using only those facts.
+            Keep it under 5 bullet points.
+
+            Information:
+            {information}
+            """
+
+    async def run(self, state: AgentState, on_facts: Callable[[list], None] = None,
+                  on_token: Callable[[str], None] = None) -> AgentState:
+        prompt = self.build_prompt("\n".join(state["research_results"]), state["query"])
+
+        # Everything before the ANSWER marker is the facts section; only the answer is streamed
+        buffer, answer, in_answer = "", "", False
+        async for chunk in acall_llm_stream(prompt):
+            if in_answer:
+                answer += chunk
+                if on_token:
+                    on_token(chunk)
+                continue
+            buffer += chunk
+            marker = buffer.upper().find(self.ANSWER_MARKER)
+            if marker == -1:
+                continue
+            in_answer = True
+            facts = self._parse_facts(buffer[:marker])
+            state["validated_results"] = facts
+            if on_facts:
+                on_facts(facts)
+            answer = buffer[marker + len(self.ANSWER_MARKER):].lstrip()
+            if answer and on_token:
+                on_token(answer)
+
+        if not in_answer:
+            # Model ignored the format: treat the whole output as the answer
+            state["validated_results"] = []
+            answer = buffer
+            if on_facts:
+                on_facts([])
+            if on_token:
+                on_token(buffer)
+
+        state["final_answer"] = answer.strip()
+        state["logs"].append("ValidateSummarizeAgent validated results and generated a final answer.")
+        return state
+
+    @staticmethod
+    def _parse_facts(text: str) -> list:
+        lines = [line.strip() for line in text.split("\n") if line.strip()]
+        return [line for line in lines if line.upper().rstrip(":") != "FACTS"]
@@ -0,0 +1,167 @@
+# Small in-process caches shared by memory, tools and the API
+
+from collections import OrderedDict
+import threading
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Args:
+        maxsize: Maximum number of entries kept; least recently used are evicted first
+        ttl: Seconds an entry stays valid (None or 0 disables expiry)
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            return default if item is _MISSING else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive cache key for a query string."""
+    return " ".join(query.lower().split())
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query embedding similarity.
+
+    A lookup hits when a stored query's embedding has cosine similarity of at
+    least `threshold` with the new one. Entries expire after their TTL and
+    the least recently used entry is evicted once `maxsize` is reached.
+
+    Args:
+        threshold: Minimum cosine similarity for a hit
+        maxsize: Maximum number of cached answers
+        ttl: Default seconds an answer stays valid
+    """
+
+    def __init__(self, threshold: float = 0.92, maxsize: int = 1000, ttl: float = 3600):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # normalized query -> (unit embedding, value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, query: str, embedding, threshold: float = None) -> dict:
+        """
+        Return the cached value for the most similar stored query, or None.
+
+        Args:
+            query: Query text (exact normalized matches skip the similarity scan)
+            embedding: Query embedding
+            threshold: Override the similarity threshold (e.g. looser under load)
+        """
+        import numpy as np
+
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            for stale in [k for k, (_, _, exp) in self._entries.items() if exp <= now]:
+                del self._entries[stale]
+
+            match = key if key in self._entries else None
+            if match is None and self._entries and embedding is not None:
+                keys = list(self._entries)
+                matrix = np.stack([self._entries[k][0] for k in keys])
+                scores = matrix @ _unit(embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= (self.threshold if threshold is None else threshold):
+                    match = keys[best]
+
+            if match is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            self.hits += 1
+            return self._entries[match][1]
+
+    def store(self, query: str, embedding, value: dict, ttl: float = None):
+        if self.maxsize <= 0 or embedding is None:
+            return
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            key = normalize_query(query)
+            self._entries[key] = (_unit(embedding), value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _unit(embedding):
+    import numpy as np
+
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,145 @@
+# Runtime settings (read from the environment / .env)
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Memory / embeddings
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "research_assistant")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# "chroma" or "numpy" (in-process memory-mapped index stored under CHROMA_PATH)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "chroma")
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")  # float32, float16 or int8
+# "sentence_transformers" (torch) or "onnx" (ONNX Runtime from a local directory, no torch)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence_transformers")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE")  # e.g. onnx/model_qint8_avx2.onnx
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+WARMUP_ON_STARTUP = _bool("WARMUP_ON_STARTUP", True)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "512"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))
+MEMORY_COUNT_TTL = float(os.getenv("MEMORY_COUNT_TTL", "5"))  # other processes may write to the store
+
+# Hybrid retrieval: dense candidates fused with BM25 matches (reciprocal-rank fusion)
+HYBRID_SEARCH = _bool("HYBRID_SEARCH", True)
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Memory lifecycle (0 disables a limit)
+MEMORY_MAX_DOCS = int(os.getenv("MEMORY_MAX_DOCS", "50000"))  # web results only
+MEMORY_MAX_AGE = float(os.getenv("MEMORY_MAX_AGE", str(30 * 24 * 3600)))  # seconds, web results only
+MEMORY_COMPACT_THRESHOLD = float(os.getenv("MEMORY_COMPACT_THRESHOLD", "0.97"))
+MEMORY_MAINTENANCE_INTERVAL = float(os.getenv("MEMORY_MAINTENANCE_INTERVAL", "600"))
+
+# LLM
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+# Retrieval
+MEMORY_DEADLINE = float(os.getenv("MEMORY_DEADLINE", "2"))
+WEB_DEADLINE = float(os.getenv("WEB_DEADLINE", "8"))
+MEMORY_HEDGE_DELAY = float(os.getenv("MEMORY_HEDGE_DELAY", "0.5"))
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "1000"))
+
+# Semantic answer cache
+ANSWER_CACHE_ENABLED = _bool("ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Answers built from fresh web results go stale sooner
+ANSWER_CACHE_WEB_TTL = float(os.getenv("ANSWER_CACHE_WEB_TTL", "600"))
+# Strategies whose answers may be cached at all
+ANSWER_CACHE_STRATEGIES = [
+    s.strip() for s in os.getenv(
+        "ANSWER_CACHE_STRATEGIES", "direct_answer,memory_retrieval,hybrid,web_research"
+    ).split(",") if s.strip()
+]
+
+# Web search
+WEB_CACHE_SIZE = int(os.getenv("WEB_CACHE_SIZE", "512"))
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", "900"))
+WEB_FANOUT_WORKERS = int(os.getenv("WEB_FANOUT_WORKERS", "8"))
+WEB_DEDUPE_THRESHOLD = float(os.getenv("WEB_DEDUPE_THRESHOLD", "0.8"))
+# Local reformulations searched alongside each web query (0 = search the query only)
+WEB_REFORMULATIONS = int(os.getenv("WEB_REFORMULATIONS", "1"))
+
+# Deep research: fetch result pages and use their main text instead of search snippets
+DEEP_RESEARCH = _bool("DEEP_RESEARCH", False)
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "4"))  # seconds for all pages of one request
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "3"))  # connect/read timeout per page
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "32"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(512 * 1024)))
+FETCH_MAX_CHARS = int(os.getenv("FETCH_MAX_CHARS", "20000"))
+FETCH_CHUNKS_PER_PAGE = int(os.getenv("FETCH_CHUNKS_PER_PAGE", "2"))  # leading chunks passed to validation
+FETCH_CACHE_SIZE = int(os.getenv("FETCH_CACHE_SIZE", "256"))
+FETCH_CACHE_TTL = float(os.getenv("FETCH_CACHE_TTL", "3600"))
+FETCH_MAX_REDIRECTS = int(os.getenv("FETCH_MAX_REDIRECTS", "5"))
+FETCH_MAX_HOSTS = int(os.getenv("FETCH_MAX_HOSTS", "256"))  # per-host limiters kept (least recently used dropped)
+FETCH_ALLOW_PRIVATE = _bool("FETCH_ALLOW_PRIVATE", False)  # localhost/private hosts, e.g. for local testing
+FETCH_USER_AGENT = os.getenv("FETCH_USER_AGENT", "Mozilla/5.0 (compatible; ResearchAssistant/1.0)")
+
+# Document ingestion
+DATA_DIR = os.getenv("DATA_DIR", "./data")
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "8"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))  # 0 = one per CPU
+
+# Query routing
+ROUTER_ENABLED = _bool("ROUTER_ENABLED", True)
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.45"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.08"))
+
+# Start the web search concurrently with planning (discarded if the strategy doesn't need it)
+SPECULATIVE_SEARCH = _bool("SPECULATIVE_SEARCH", False)
+
+# Context packing before validation
+CONTEXT_PACKING = _bool("CONTEXT_PACKING", True)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+CONTEXT_DUP_THRESHOLD = float(os.getenv("CONTEXT_DUP_THRESHOLD", "0.92"))
+
+# "two_pass": validation then summary; "single_pass": one streamed validate-and-summarize call
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_pass").strip().lower()
+
+# Identical concurrent queries share one pipeline run
+COALESCE_REQUESTS = _bool("COALESCE_REQUESTS", True)
+
+# Admission control (0 in-flight = unlimited)
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# Past this load (in-flight + queued, relative to max in-flight) prefer memory and cached answers
+ADMISSION_DEGRADE_LOAD = float(os.getenv("ADMISSION_DEGRADE_LOAD", "0.8"))
+DEGRADED_CACHE_THRESHOLD = float(os.getenv("DEGRADED_CACHE_THRESHOLD", "0.85"))
+
+# Resumable streams: runs (and their numbered events) kept for Last-Event-ID reconnects
+STREAM_MAX_RUNS = int(os.getenv("STREAM_MAX_RUNS", "1000"))
+STREAM_RUN_TTL = float(os.getenv("STREAM_RUN_TTL", "600"))
+STREAM_BUFFER_EVENTS = int(os.getenv("STREAM_BUFFER_EVENTS", "5000"))
+
+# Batch research (/chat/batch)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+
+# Observability: add trace_id/timings/tokens to /chat responses and the SSE complete event
+INCLUDE_TIMINGS = _bool("INCLUDE_TIMINGS", True)
@@ -0,0 +1,138 @@
+# Context packing between research and validation: dedupe, MMR rerank, token budget
+
+import asyncio
+import threading
+from typing import List, Tuple
+
+from backend import config
+from backend.state import AgentState
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, else a ~4 chars/token estimate."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def mmr_select(query_embedding, embeddings, lambda_: float, dup_threshold: float) -> Tuple[List[int], int]:
+    """
+    Order candidates by maximal marginal relevance.
+
+    Args:
+        query_embedding: Query vector
+        embeddings: Candidate vectors (rows)
+        lambda_: Weight of relevance vs. diversity (1.0 = relevance only)
+        dup_threshold: Candidates this similar to an already selected one are dropped
+
+    Returns:
+        (selected candidate indices in MMR order, number of dropped near-duplicates)
+    """
+    import numpy as np
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    remaining = list(range(len(vectors)))
+    selected, dropped = [], 0
+    while remaining:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy
+        best = int(np.argmax(scores))
+        index = remaining.pop(best)
+        if selected and redundancy[best] >= dup_threshold:
+            dropped += 1
+            continue
+        selected.append(index)
+    return selected, dropped
+
+
+class ContextPacker:
+    """
+    Shrink research results to a token budget before validation.
+
+    Candidates are embedded in one batch with the query, reranked with MMR,
+    near-duplicates are dropped and snippets are added in MMR order while
+    they fit in `budget` tokens.
+
+    Args:
+        memory: Memory whose embedding model is reused (None falls back to exact dedupe)
+        budget: Maximum prompt tokens for the packed context
+    """
+
+    def __init__(self, memory=None, budget: int = None, lambda_: float = None, dup_threshold: float = None):
+        self.memory = memory
+        self.budget = budget or config.CONTEXT_TOKEN_BUDGET
+        self.lambda_ = config.CONTEXT_MMR_LAMBDA if lambda_ is None else lambda_
+        self.dup_threshold = config.CONTEXT_DUP_THRESHOLD if dup_threshold is None else dup_threshold
+        self.totals = {"requests": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0, "duplicates_dropped": 0}
+
+    def pack(self, query: str, candidates: List[str]) -> Tuple[List[str], dict]:
+        """
+        Returns:
+            (packed snippets, stats dict with token counts before/after)
+        """
+        candidates = list(dict.fromkeys(c for c in candidates if c and c.strip()))
+        dropped = 0
+        order = list(range(len(candidates)))
+        if self.memory is not None and len(candidates) > 1:
+            try:
+                embeddings = self.memory.embed([query] + candidates)
+                order, dropped = mmr_select(embeddings[0], embeddings[1:], self.lambda_, self.dup_threshold)
+            except Exception as e:
+                print(f"Context rerank failed, keeping original order: {e}")
+
+        tokens = [count_tokens(c) for c in candidates]
+        packed, used = [], 0
+        for index in order:
+            if used + tokens[index] > self.budget:
+                continue
+            packed.append(candidates[index])
+            used += tokens[index]
+
+        stats = {
+            "candidates": len(candidates),
+            "kept": len(packed),
+            "duplicates_dropped": dropped,
+            "tokens_in": sum(tokens),
+            "tokens_out": used,
+            "tokens_saved": sum(tokens) - used,
+        }
+        self.totals["requests"] += 1
+        for key in ("tokens_in", "tokens_out", "tokens_saved", "duplicates_dropped"):
+            self.totals[key] += stats[key]
+        return packed, stats
+
+    async def run(self, state: AgentState) -> AgentState:
+        if not state["research_results"]:
+            return state
+        packed, stats = await asyncio.to_thread(self.pack, state["query"], state["research_results"])
+        state["research_results"] = packed
+        state["logs"].append(
+            f"ContextPacker: kept {stats['kept']}/{stats['candidates']} snippets, "
+            f"{stats['tokens_out']} tokens (saved {stats['tokens_saved']})."
+        )
+        return state
+
+    def stats(self) -> dict:
+        return dict(self.totals)
@@ -0,0 +1,92 @@
+# Embedding model backends: sentence-transformers (torch) or ONNX Runtime (CPU, no torch)
+
+import os
+from typing import List, Union
+
+from backend import config
+
+
+class OnnxEmbedder:
+    """
+    Sentence embeddings from an exported ONNX transformer with the
+    SentenceTransformer `encode` API (mean pooling + L2 normalization, as
+    all-MiniLM-L6-v2 does).
+
+    Works fully offline from a local directory containing `tokenizer.json`
+    and an ONNX file, e.g. a download of sentence-transformers/all-MiniLM-L6-v2
+    (its `onnx/` folder also ships int8-quantized variants).
+
+    Args:
+        path: Model directory
+        onnx_file: ONNX file relative to `path` (default: model.onnx or onnx/model.onnx)
+        max_length: Tokens kept per text
+        threads: ONNX Runtime intra-op threads (0 = runtime default)
+    """
+
+    def __init__(self, path: str, onnx_file: str = None, max_length: int = 256, threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        candidates = [onnx_file] if onnx_file else ["model.onnx", os.path.join("onnx", "model.onnx")]
+        model_path = next((os.path.join(path, c) for c in candidates if os.path.exists(os.path.join(path, c))), None)
+        if model_path is None:
+            raise FileNotFoundError(f"No ONNX model ({', '.join(candidates)}) under {path}")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               **kwargs):
+        import numpy as np
+
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean over real (non-padding) tokens, then unit length
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            batches.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedder(backend: str = None, model_name: str = None, path: str = None):
+    """
+    Load the configured embedding model.
+
+    Args:
+        backend: "sentence_transformers" or "onnx" (default EMBEDDING_BACKEND)
+        model_name: sentence-transformers model name or path
+        path: Local model directory for the ONNX backend (default EMBEDDING_MODEL_PATH)
+
+    Returns:
+        An object with a SentenceTransformer-compatible `encode`
+    """
+    backend = (backend or config.EMBEDDING_BACKEND).strip().lower()
+    if backend == "onnx":
+        path = path or config.EMBEDDING_MODEL_PATH
+        if not path:
+            raise RuntimeError("EMBEDDING_BACKEND=onnx needs EMBEDDING_MODEL_PATH")
+        return OnnxEmbedder(path, onnx_file=config.EMBEDDING_ONNX_FILE, threads=config.EMBEDDING_THREADS)
+    if backend == "sentence_transformers":
+        # Imports torch; deferred so processes that never embed don't pay for it
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name or config.EMBEDDING_MODEL)
+    raise ValueError(f"Unknown embedding backend: {backend}")
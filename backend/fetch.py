@@ -0,0 +1,347 @@
+# Deep research: concurrent page fetching with streamed, capped main-text extraction
+
+import asyncio
+import codecs
+import ipaddress
+import re
+import socket
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+from backend import config
+from backend.cache import TTLCache
+from backend.metrics import span
+
+TEXT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+
+class TextExtractor(HTMLParser):
+    """
+    Incremental main-text extraction from HTML fed in arbitrary pieces.
+
+    Text inside boilerplate elements (scripts, styles, navigation, headers,
+    footers, forms, ...) is dropped and block elements become line breaks,
+    so what remains is mostly the article body. `feed` can be called with
+    each decoded chunk as it arrives off the network.
+    """
+
+    SKIP = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer",
+            "aside", "form", "button", "select", "iframe"}
+    BLOCK = {"p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th",
+             "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "br", "hr", "dd", "dt"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.length = 0
+        self._parts: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self.BLOCK:
+            self._parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCK:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self.BLOCK:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth and data.strip():
+            self._parts.append(data)
+            self.length += len(data)
+
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self._parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+
+class PlainTextExtractor:
+    """Same interface as TextExtractor for text/plain bodies."""
+
+    def __init__(self):
+        self.title = ""
+        self.length = 0
+        self._parts: List[str] = []
+
+    def feed(self, data: str):
+        self._parts.append(data)
+        self.length += len(data)
+
+    def close(self):
+        pass
+
+    def text(self) -> str:
+        return re.sub(r"\n\s*\n+", "\n", "".join(self._parts)).strip()
+
+
+class PageFetcher:
+    """
+    Fetches result pages concurrently through one pooled async HTTP client.
+
+    Each fetch is limited per host (`per_host` concurrent requests), streams
+    the body and stops after `max_bytes` bytes or `max_chars` characters of
+    extracted text, so a huge or slow page costs at most the deadline.
+    Pages are cached by URL; cached pages that came with an ETag or
+    Last-Modified header are revalidated with a conditional request, others
+    are served from the cache until they expire.
+
+    Redirects are followed by hand (at most FETCH_MAX_REDIRECTS) so that
+    every hop is checked: unless `allow_private` is set, a hop whose host is,
+    or resolves to, a loopback/private/link-local address is refused.
+
+    Args:
+        max_connections: Pool size of the shared client
+        per_host: Concurrent requests per host
+        max_bytes: Bytes read per page
+        max_chars: Characters of text extracted per page
+        timeout: Per-request connect/read timeout in seconds
+        cache_size: Pages kept in the cache
+        cache_ttl: Seconds a cached page is kept
+        allow_private: Also fetch localhost and private-network addresses
+    """
+
+    def __init__(self, max_connections: int = None, per_host: int = None, max_bytes: int = None,
+                 max_chars: int = None, timeout: float = None, cache_size: int = None,
+                 cache_ttl: float = None, allow_private: bool = None):
+        self.max_connections = max_connections or config.FETCH_MAX_CONNECTIONS
+        self.per_host = per_host or config.FETCH_PER_HOST
+        self.max_bytes = max_bytes or config.FETCH_MAX_BYTES
+        self.max_chars = max_chars or config.FETCH_MAX_CHARS
+        self.timeout = timeout or config.FETCH_TIMEOUT
+        self.allow_private = config.FETCH_ALLOW_PRIVATE if allow_private is None else allow_private
+        self.cache = TTLCache(maxsize=config.FETCH_CACHE_SIZE if cache_size is None else cache_size,
+                              ttl=config.FETCH_CACHE_TTL if cache_ttl is None else cache_ttl)
+        self._client = None
+        # host -> [semaphore, active fetches]; least recently used idle hosts are dropped
+        self._hosts: "OrderedDict[str, list]" = OrderedDict()
+        self.counters = {"fetched": 0, "cache_hits": 0, "not_modified": 0, "skipped": 0, "refused": 0,
+                         "failed": 0, "timed_out": 0, "truncated": 0, "bytes": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            # httpx is only needed once deep research actually runs
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                follow_redirects=False,  # see _open: each hop is checked
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                headers={"User-Agent": config.FETCH_USER_AGENT,
+                         "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9"},
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _is_public(address) -> bool:
+        return address.is_global
+
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return [info[4][0] for info in infos]
+
+    def allowed(self, url: str) -> bool:
+        """http(s) URLs only, and no loopback/private literal hosts unless allow_private is set."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return False
+        if self.allow_private:
+            return True
+        if parts.hostname == "localhost" or parts.hostname.endswith(".localhost"):
+            return False
+        try:
+            address = ipaddress.ip_address(parts.hostname)
+        except ValueError:
+            return True
+        return self._is_public(address)
+
+    async def permitted(self, url: str) -> bool:
+        """allowed(), and unless allow_private is set every address the host resolves to is public."""
+        if not self.allowed(url):
+            return False
+        if self.allow_private:
+            return True
+        parts = urlsplit(url)
+        try:
+            addresses = await self._resolve(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        except OSError:
+            return False
+        return bool(addresses) and all(self._is_public(ipaddress.ip_address(a.split("%")[0])) for a in addresses)
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        """Hold one of the host's `per_host` slots."""
+        host = urlsplit(url).netloc.lower()
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = [asyncio.Semaphore(self.per_host), 0]
+            idle = [h for h, (_, active) in self._hosts.items() if not active]
+            for h in idle[:max(0, len(self._hosts) - config.FETCH_MAX_HOSTS)]:
+                del self._hosts[h]
+        self._hosts.move_to_end(host)
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+
+    async def _open(self, url: str, headers: dict):
+        """
+        Send a streamed GET, following redirects by hand so each hop is checked.
+
+        Returns:
+            The final (unread) response, or None if a hop was refused or there were too many redirects
+        """
+        for _ in range(config.FETCH_MAX_REDIRECTS + 1):
+            if not await self.permitted(url):
+                return None
+            response = await self.client.send(self.client.build_request("GET", url, headers=headers), stream=True)
+            location = response.headers.get("location")
+            if not (response.is_redirect and location):
+                return response
+            await response.aclose()
+            url = urljoin(str(response.url), location)
+        return None
+
+    async def fetch(self, url: str) -> Optional[Dict[str, str]]:
+        """
+        Fetch one page and extract its main text.
+
+        Returns:
+            {"url", "title", "text"} or None if the page was skipped or failed
+        """
+        if not self.allowed(url):
+            self.counters["skipped"] += 1
+            return None
+
+        cached = self.cache.get(url)
+        headers = {}
+        if cached is not None:
+            if not (cached["etag"] or cached["last_modified"]):
+                self.counters["cache_hits"] += 1
+                return cached["page"]
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with self._host_slot(url):
+            try:
+                response = await self._open(url, headers)
+                if response is None:
+                    self.counters["refused"] += 1
+                    return None
+                try:
+                    if response.status_code == 304 and cached is not None:
+                        self.counters["not_modified"] += 1
+                        self.cache.set(url, cached)
+                        return cached["page"]
+                    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                    if response.status_code != 200 or (content_type and content_type not in TEXT_TYPES):
+                        self.counters["skipped"] += 1
+                        return None
+                    page = await self._read(response, content_type)
+                finally:
+                    await response.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Could not fetch {url}: {e}")
+                self.counters["failed"] += 1
+                return None
+
+        if not page["text"]:
+            return None
+        self.counters["fetched"] += 1
+        self.cache.set(url, {"page": page, "etag": response.headers.get("etag"),
+                             "last_modified": response.headers.get("last-modified")})
+        return page
+
+    async def _read(self, response, content_type: str) -> Dict[str, str]:
+        """Stream the body into the extractor until it ends or a cap is reached."""
+        extractor = PlainTextExtractor() if content_type == "text/plain" else TextExtractor()
+        decoder = codecs.getincrementaldecoder(self._encoding(response))(errors="replace")
+        received = 0
+        async for data in response.aiter_bytes():
+            data = data[:self.max_bytes - received]
+            received += len(data)
+            extractor.feed(decoder.decode(data))
+            if received >= self.max_bytes or extractor.length >= self.max_chars:
+                self.counters["truncated"] += 1
+                break
+        else:
+            extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        self.counters["bytes"] += received
+        return {"url": str(response.url), "title": " ".join(extractor.title.split()),
+                "text": extractor.text()[:self.max_chars]}
+
+    @staticmethod
+    def _encoding(response) -> str:
+        try:
+            return codecs.lookup(response.charset_encoding or "utf-8").name
+        except LookupError:
+            return "utf-8"
+
+    async def fetch_many(self, urls: List[str], deadline: float = None) -> Dict[str, Dict[str, str]]:
+        """
+        Fetch pages concurrently; whatever hasn't finished by the deadline is cancelled.
+
+        Args:
+            urls: Page URLs (duplicates are fetched once)
+            deadline: Seconds for the whole set (default FETCH_DEADLINE)
+
+        Returns:
+            {url: page} for the pages that were fetched in time
+        """
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if not urls:
+            return {}
+        tasks = {asyncio.create_task(self.fetch(url)): url for url in urls}
+        with span("page_fetch"):
+            done, pending = await asyncio.wait(tasks, timeout=deadline or config.FETCH_DEADLINE)
+        for task in pending:
+            task.cancel()
+        self.counters["timed_out"] += len(pending)
+        pages = {}
+        for task in done:
+            page = task.result()
+            if page:
+                pages[tasks[task]] = page
+        return pages
+
+    def stats(self) -> dict:
+        return {**self.counters, "cached_pages": len(self.cache), "hosts": len(self._hosts),
+                "open": self._client is not None}
+
+
+_fetcher = PageFetcher()
+
+def get_fetcher() -> PageFetcher:
+    """Process-wide fetcher, so every request shares one connection pool and page cache."""
+    return _fetcher
@@ -0,0 +1,242 @@
+# Document ingestion: data/ files -> chunks -> Memory
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from backend import config
+from backend.memory import Memory, get_memory
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+
+
+def chunk_text(text: str, size: int = None, overlap: int = None) -> List[str]:
+    """
+    Split text into chunks of about `size` characters, each sharing `overlap`
+    characters with the previous one. Cuts are moved back to whitespace when possible.
+    """
+    size = size or config.INGEST_CHUNK_SIZE
+    overlap = config.INGEST_CHUNK_OVERLAP if overlap is None else overlap
+    text = " ".join(text.split())
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut != -1:
+                end = cut
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, page: int, index: int, text: str) -> str:
+    """Document ID of one ingested chunk; files sharing a chunk each keep their own copy."""
+    key = "\0".join((source, str(page), str(index), text))
+    return f"doc_{hashlib.md5(key.encode()).hexdigest()}"
+
+
+def _page_count(path: str) -> int:
+    if not path.lower().endswith(".pdf"):
+        return 1
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract(path: str, start: int, end: int, size: int, overlap: int) -> List[Tuple[int, List[str]]]:
+    """Worker: extract and chunk pages [start, end) of one file. Pages are 1-based in the output."""
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        reader = PdfReader(path)
+        pages = []
+        for number in range(start, end):
+            try:
+                text = reader.pages[number].extract_text() or ""
+            except Exception as e:
+                print(f"Could not extract page {number + 1} of {path}: {e}")
+                text = ""
+            pages.append((number + 1, chunk_text(text, size, overlap)))
+        return pages
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return [(1, chunk_text(f.read(), size, overlap))]
+
+
+class Ingestor:
+    """
+    Incremental, restartable ingestion of documents into Memory.
+
+    Text extraction and chunking run in a process pool over page ranges;
+    chunks are embedded in batches and upserted with source/page metadata.
+    A manifest of file content hashes lets unchanged files be skipped, and a
+    file is only recorded once all of its chunks are confirmed stored, so an
+    interrupted or failed run picks up where it stopped (already stored
+    chunks are not re-embedded). A changed file's previous chunks are
+    deleted before its new version is stored; ingested documents never
+    expire by age, so this is what keeps them current.
+
+    Args:
+        memory: Memory to ingest into (defaults to the shared instance)
+        workers: Extraction processes
+        manifest_path: Where file hashes of completed files are kept
+    """
+
+    def __init__(self, memory: Memory = None, workers: int = None, manifest_path: str = None,
+                 chunk_size: int = None, chunk_overlap: int = None, pages_per_task: int = None):
+        self.memory = memory or get_memory()
+        self.workers = workers or config.INGEST_WORKERS or os.cpu_count() or 1
+        self.manifest_path = manifest_path or os.path.join(config.CHROMA_PATH, "ingest_manifest.json")
+        self.chunk_size = chunk_size or config.INGEST_CHUNK_SIZE
+        self.chunk_overlap = config.INGEST_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.pages_per_task = pages_per_task or config.INGEST_PAGES_PER_TASK
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, str]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    @staticmethod
+    def discover(paths: List[str]) -> List[str]:
+        """Supported files under the given files/directories, sorted."""
+        found = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    found.extend(os.path.join(root, n) for n in names if n.lower().endswith(SUPPORTED_EXTENSIONS))
+            elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+                found.append(path)
+        return sorted(set(found))
+
+    def _pages(self, pool, page_counts: Dict[str, int]) -> Iterator[Tuple[str, int, List[str]]]:
+        """Stream (file, page, chunks) as extraction tasks complete."""
+        futures = {}
+        for path, pages in page_counts.items():
+            for start in range(0, pages, self.pages_per_task):
+                end = min(start + self.pages_per_task, pages)
+                future = pool.submit(_extract, path, start, end, self.chunk_size, self.chunk_overlap)
+                futures[future] = path
+        for future in as_completed(futures):
+            path = futures[future]
+            for page, chunks in future.result():
+                yield path, page, chunks
+
+    def ingest(self, paths: List[str] = None, force: bool = False) -> dict:
+        """
+        Ingest supported files under `paths` (default: data/).
+
+        Args:
+            paths: Files or directories to ingest
+            force: Re-ingest files even if their content hash is unchanged
+
+        Returns:
+            Stats dict with file/page/chunk counts and pages/s, chunks/s
+            (plus "error" if storing failed; files not yet recorded are
+            retried on the next run)
+        """
+        started = time.perf_counter()
+        # Absolute paths are both the manifest keys and the chunks' `source`, so runs started
+        # from different directories (CLI, /ingest) agree on which chunks belong to a file
+        files = [os.path.abspath(p) for p in self.discover(paths or [config.DATA_DIR])]
+        hashes = {path: file_hash(path) for path in files}
+        todo = [p for p in files if force or self.manifest.get(p) != hashes[p]]
+        stats = {"files": len(todo), "skipped_files": len(files) - len(todo),
+                 "pages": 0, "chunks": 0, "stored": 0, "replaced": 0}
+
+        if todo:
+            remaining = {path: _page_count(path) for path in todo}
+            # Files ingested before (now changed or forced): their old chunks go before the new ones are stored.
+            # Unrecorded files keep whatever an interrupted run already stored.
+            replace = {p for p in todo if p in self.manifest}
+            for path in [p for p, count in remaining.items() if count == 0]:
+                if path in replace:
+                    stats["replaced"] += self.memory.forget(path)
+                self.manifest[path] = hashes[path]
+            batch_texts, batch_meta, batch_ids = [], [], []
+
+            def flush():
+                # Raises if the batch could not be embedded/stored, so nothing is recorded as done
+                if batch_texts:
+                    stats["stored"] += self.memory.save(list(batch_texts), metadata=list(batch_meta),
+                                                        raise_errors=True, ids=list(batch_ids))
+                    batch_texts.clear()
+                    batch_meta.clear()
+                    batch_ids.clear()
+
+            # Spawned workers: forking from a server's worker thread can deadlock
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                for path, page, chunks in self._pages(pool, dict(remaining)):
+                    if path in replace:
+                        # Drop the previous version's chunks so stale text doesn't linger
+                        replace.discard(path)
+                        stats["replaced"] += self.memory.forget(path)
+                    for i, chunk in enumerate(chunks):
+                        batch_texts.append(chunk)
+                        batch_ids.append(chunk_id(path, page, i, chunk))
+                        batch_meta.append({"source": path, "page": page, "chunk": i,
+                                           "file_hash": hashes[path]})
+                    stats["pages"] += 1
+                    stats["chunks"] += len(chunks)
+                    if len(batch_texts) >= self.memory.batch_size * 4:
+                        flush()
+
+                    remaining[path] -= 1
+                    if remaining[path] == 0:
+                        # Everything for this file must be stored before it is marked done
+                        flush()
+                        self.manifest[path] = hashes[path]
+                        self._save_manifest()
+                flush()
+            except Exception as e:
+                print(f"Ingestion stopped, unfinished files will be retried: {e}")
+                stats["error"] = str(e)
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["pages_per_sec"] = round(stats["pages"] / elapsed, 2) if elapsed else 0.0
+        stats["chunks_per_sec"] = round(stats["chunks"] / elapsed, 2) if elapsed else 0.0
+        return stats
+
+
+def ingest(paths: List[str] = None, force: bool = False, memory: Memory = None, workers: int = None) -> dict:
+    return Ingestor(memory=memory, workers=workers).ingest(paths, force=force)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest documents into research memory.")
+    parser.add_argument("paths", nargs="*", help=f"Files or directories (default: {config.DATA_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes")
+    parser.add_argument("--force", action="store_true", help="Re-ingest unchanged files")
+    args = parser.parse_args()
+
+    result = ingest(args.paths or None, force=args.force, workers=args.workers)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,122 @@
+# Lexical retrieval: incremental BM25 inverted index and reciprocal-rank fusion
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# Keeps version numbers and identifiers ("3.11", "gpt-4o", "llama_3") as single terms
+TOKEN = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory BM25 index updated document by document.
+
+    Postings map each term to {doc_id: term frequency}; document lengths are
+    tracked so IDF and length normalization stay exact as documents come and go.
+
+    Args:
+        k1: Term-frequency saturation
+        b: Length normalization strength
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.loaded = False
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._lengths
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._lengths)
+
+    def add(self, items: Iterable[Tuple[str, str]]):
+        """Index (doc_id, text) pairs, replacing any previous text for the same ID."""
+        with self._lock:
+            for doc_id, text in items:
+                self._remove(doc_id)
+                counts = Counter(tokenize(text or ""))
+                for term, tf in counts.items():
+                    self._postings[term][doc_id] = tf
+                self._terms[doc_id] = list(counts)
+                self._lengths[doc_id] = sum(counts.values())
+                self._total_length += self._lengths[doc_id]
+
+    def remove(self, doc_ids: Iterable[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        terms = self._terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._terms.clear()
+            self._total_length = 0
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Returns:
+            Up to `k` (doc_id, score) pairs, best first
+        """
+        with self._lock:
+            n = len(self._lengths)
+            if n == 0:
+                return []
+            avg_length = self._total_length / n
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def rrf(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """
+    Reciprocal-rank fusion: each ranking contributes 1 / (k + rank) per ID.
+
+    Args:
+        rankings: ID lists, best first
+        k: Damping constant (60 is the value from the original RRF paper)
+
+    Returns:
+        IDs ordered by fused score
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
@@ -0,0 +1,247 @@
+# Async LLM client: one pooled provider client per event loop, bounded concurrency, retries
+
+import asyncio
+import random
+import threading
+import weakref
+from typing import AsyncIterator, Callable, Dict, List
+
+from backend import config
+from backend.metrics import record_tokens, span
+
+
+class LLMProvider:
+    """
+    Interface for chat-completion backends.
+
+    Implementations own their HTTP client and keep it open for the lifetime
+    of the provider so connections (and TLS sessions) are reused.
+    """
+
+    async def complete(self, messages: List[Dict[str, str]], *, model: str,
+                       max_tokens: int = None, temperature: float = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict[str, str]], *, model: str,
+               max_tokens: int = None, temperature: float = None) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether `error` is transient (rate limit, timeout, 5xx)."""
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return True
+        status = getattr(error, "status_code", None)
+        return status == 429 or (status is not None and status >= 500)
+
+    def retry_after(self, error: Exception) -> float:
+        """Server-suggested delay in seconds, if the error carries one."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    async def aclose(self):
+        pass
+
+
+class GroqProvider(LLMProvider):
+    """Groq chat completions through a single long-lived AsyncGroq client."""
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = None):
+        from groq import AsyncGroq
+
+        # Retries are handled by LLMClient so they share its backoff and semaphore
+        self.client = AsyncGroq(
+            api_key=api_key or config.GROQ_API_KEY,
+            base_url=base_url or config.GROQ_BASE_URL,
+            timeout=timeout or config.LLM_TIMEOUT,
+            max_retries=0,
+        )
+
+    async def complete(self, messages, *, model, max_tokens=None, temperature=None):
+        kwargs = {"model": model, "messages": messages}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        response = await self.client.chat.completions.create(**kwargs)
+        if response.usage:
+            record_tokens(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content
+
+    async def stream(self, messages, *, model, max_tokens=None, temperature=None):
+        kwargs = {"model": model, "messages": messages, "stream": True}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        stream = await self.client.chat.completions.create(**kwargs)
+        async for chunk in stream:
+            # Groq reports usage on the final chunk
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage:
+                record_tokens(usage.prompt_tokens, usage.completion_tokens)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def is_retryable(self, error):
+        import groq
+
+        if isinstance(error, (groq.RateLimitError, groq.APITimeoutError, groq.APIConnectionError)):
+            return True
+        return super().is_retryable(error)
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class LLMClient:
+    """
+    Concurrency-limited, retrying front end over an LLMProvider.
+
+    Args:
+        provider: Backend that performs the actual requests
+        model: Model name passed to the provider
+        max_concurrency: Maximum in-flight requests
+        timeout: Seconds allowed per completion (per chunk when streaming)
+        max_retries: Retries for transient errors before giving up
+    """
+
+    def __init__(self, provider: LLMProvider, model: str = None, max_concurrency: int = None,
+                 timeout: float = None, max_retries: int = None):
+        self.provider = provider
+        self.model = model or config.LLM_MODEL
+        self.timeout = timeout or config.LLM_TIMEOUT
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.semaphore = asyncio.Semaphore(max_concurrency or config.LLM_MAX_CONCURRENCY)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        suggested = self.provider.retry_after(error)
+        if suggested is not None:
+            return min(suggested, config.LLM_BACKOFF_MAX)
+        # Full jitter so concurrent callers that hit a rate limit don't retry in lockstep
+        return random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+
+    async def complete(self, prompt: str, max_tokens: int = 150, temperature: float = 0.3) -> str:
+        messages = [{"role": "user", "content": prompt}]
+        with span("llm.complete"):
+            return await self._complete(messages, max_tokens, temperature)
+
+    async def _complete(self, messages, max_tokens, temperature) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.semaphore:
+                    return await asyncio.wait_for(
+                        self.provider.complete(messages, model=self.model,
+                                               max_tokens=max_tokens, temperature=temperature),
+                        timeout=self.timeout,
+                    )
+            except Exception as e:
+                if attempt >= self.max_retries or not self.provider.is_retryable(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+    async def stream(self, prompt: str, max_tokens: int = None,
+                     temperature: float = None) -> AsyncIterator[str]:
+        messages = [{"role": "user", "content": prompt}]
+        with span("llm.stream"):
+            async for chunk in self._stream(messages, max_tokens, temperature):
+                yield chunk
+
+    async def _stream(self, messages, max_tokens, temperature) -> AsyncIterator[str]:
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self.semaphore:
+                    chunks = self.provider.stream(messages, model=self.model,
+                                                  max_tokens=max_tokens, temperature=temperature)
+                    try:
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                            except StopAsyncIteration:
+                                return
+                            started = True
+                            yield chunk
+                    finally:
+                        await chunks.aclose()
+            except Exception as e:
+                # Once tokens have reached the caller a retry would duplicate output
+                if started or attempt >= self.max_retries or not self.provider.is_retryable(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+
+_provider_factory: Callable[[], LLMProvider] = GroqProvider
+_clients = weakref.WeakKeyDictionary()
+
+
+def set_provider(factory: Callable[[], LLMProvider]):
+    """
+    Replace the provider used for new clients (e.g. a fake for tests/benchmarks).
+
+    Args:
+        factory: Zero-argument callable returning an LLMProvider
+    """
+    global _provider_factory
+    _provider_factory = factory
+    _clients.clear()
+
+
+def get_llm() -> LLMClient:
+    """Return the LLMClient bound to the running event loop, creating it once."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = LLMClient(_provider_factory())
+        _clients[loop] = client
+    return client
+
+
+async def acall_llm(prompt: str, max_tokens: int = 150, temperature: float = 0.3) -> str:
+    return await get_llm().complete(prompt, max_tokens=max_tokens, temperature=temperature)
+
+
+async def acall_llm_stream(prompt: str, max_tokens: int = None,
+                           temperature: float = None) -> AsyncIterator[str]:
+    async for chunk in get_llm().stream(prompt, max_tokens=max_tokens, temperature=temperature):
+        yield chunk
+
+
+# Synchronous callers share one background loop (and therefore one pooled client)
+_sync_loop = None
+_sync_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _sync_loop
+    if _sync_loop is None:
+        with _sync_lock:
+            if _sync_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+                _sync_loop = loop
+    return _sync_loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the background LLM loop from synchronous code."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def iter_sync(agen: AsyncIterator):
+    """Iterate an async generator on the background LLM loop from synchronous code."""
+    loop = _background_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
@@ -1,31 +1,121 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from langgraph.graph import StateGraph, END, START
-from backend.agents import ManagerAgent, ResearchAgent, ValidationAgent, SummaryAgent
+from backend.agents import ManagerAgent, ResearchAgent, ValidationAgent, SummaryAgent, ValidateSummarizeAgent
 from backend.state import AgentState
-from backend.tools import search_web, call_llm, call_llm_stream
-from backend.memory import Memory
+from langgraph.config import get_stream_writer
+from backend.memory import Memory, get_memory
+from backend.cache import SemanticCache, TTLCache, normalize_query
+from backend.context import ContextPacker
+from backend import metrics
+from backend.admission import AdmissionController, Overloaded, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from backend.metrics import span, start_trace
+from backend import config
 from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import AsyncIterator, List, Optional, Tuple
+from collections import deque
 import asyncio
+import itertools
 import json
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model in the background so the first request doesn't pay for it
+    warmup_task = None
+    if config.WARMUP_ON_STARTUP and manager.memory_available:
+        warmup_task = asyncio.create_task(asyncio.to_thread(manager.memory.warm_up))
+    maintenance_task = None
+    if shared_memory is not None and config.MEMORY_MAINTENANCE_INTERVAL > 0:
+        maintenance_task = asyncio.create_task(maintain_memory(config.MEMORY_MAINTENANCE_INTERVAL))
+    yield
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if maintenance_task:
+        maintenance_task.cancel()
+    await research.fetcher.aclose()
+    # Don't lose queued write-behind saves on shutdown
+    if shared_memory is not None:
+        await asyncio.to_thread(shared_memory.flush)
 
-manager = ManagerAgent()
-research = ResearchAgent()
+async def maintain_memory(interval: float):
+    """Periodic eviction and compaction so the store doesn't grow without bound."""
+    while True:
+        await asyncio.sleep(interval)
+        result = await asyncio.to_thread(shared_memory.maintain)
+        if any(result.values()):
+            print(f"Memory maintenance: {result}")
+
+app = FastAPI(lifespan=lifespan)
+
+# One Memory (Chroma client + embedding model) shared by every agent
+try:
+    shared_memory = get_memory()
+except Exception as e:
+    print(f"Memory initialization failed: {e}")
+    shared_memory = None
+
+# Bounds concurrent pipelines; its load also drives the manager's degraded mode
+admission = AdmissionController()
+
+manager = ManagerAgent(memory=shared_memory, degraded=lambda: admission.degraded)
+research = ResearchAgent(memory=shared_memory)
+packer = ContextPacker(memory=shared_memory)
 validation = ValidationAgent()
 summary = SummaryAgent()
+validate_summarize = ValidateSummarizeAgent()
+
+# Nodes announce themselves on the custom stream; /chat/stream turns these into SSE events
+async def manager_node(state: AgentState):
+    if state["plan"]:
+        # Batch runs plan all their queries together before entering the graph
+        return state
+    get_stream_writer()({"type": "agent", "agent": "Manager", "status": "running"})
+    with span("node.manager"):
+        return await manager.run(state)
+
+async def research_node(state: AgentState):
+    get_stream_writer()({"type": "agent", "agent": "Research", "status": "running"})
+    with span("node.research"):
+        return await research.run(state)
+
+async def context_node(state: AgentState):
+    if not config.CONTEXT_PACKING:
+        return state
+    with span("node.context"):
+        return await packer.run(state)
 
-def manager_node(state: AgentState):
-    return manager.run(state)
+async def validation_node(state: AgentState):
+    get_stream_writer()({"type": "agent", "agent": "Validation", "status": "running"})
+    with span("node.validation"):
+        return await validation.run(state)
 
-def research_node(state: AgentState):
-    return research.run(state)
+async def summary_node(state: AgentState):
+    writer = get_stream_writer()
+    writer({"type": "agent", "agent": "Summary", "status": "running"})
+    writer({"type": "summary_start"})
+    with span("node.summary"):
+        return await summary.run(
+            state, on_token=lambda chunk: writer({"type": "summary_chunk", "content": chunk})
+        )
 
-def validation_node(state: AgentState):
-    return validation.run(state)
+async def answer_node(state: AgentState):
+    writer = get_stream_writer()
+    writer({"type": "agent", "agent": "Validation", "status": "running"})
 
-def summary_node(state: AgentState):
-    return summary.run(state)
+    def on_facts(facts):
+        writer({"type": "agent", "agent": "Validation", "status": "complete",
+                "message": f"Validated {len(facts)} facts"})
+        writer({"type": "agent", "agent": "Summary", "status": "running"})
+        writer({"type": "summary_start"})
+
+    with span("node.answer"):
+        return await validate_summarize.run(
+            state,
+            on_facts=on_facts,
+            on_token=lambda chunk: writer({"type": "summary_chunk", "content": chunk}),
+        )
 
 def decide_next_node(state: AgentState):
     strategy = state["plan"]["strategy"]
@@ -44,101 +134,434 @@ graph = StateGraph(AgentState)
 
 graph.add_node("manager", manager_node)
 graph.add_node("research", research_node)
+graph.add_node("context", context_node)
 graph.add_node("validation", validation_node)
 graph.add_node("summary", summary_node)
+graph.add_node("answer", answer_node)
 
 graph.add_edge(START, "manager")
 graph.add_conditional_edges("manager", decide_next_node, {
-    "direct_answer": "summary",
-    "web_research": "research",
-    "memory_retrieval": "research",
-    "hybrid": "research"
+    "summary": "summary",
+    "research": "research"
 })
-graph.add_edge("research", "validation")
-graph.add_edge("validation", "summary")
+graph.add_edge("research", "context")
+if config.PIPELINE_MODE == "single_pass":
+    # Validation and summary merged into one streamed LLM call
+    graph.add_edge("context", "answer")
+    graph.add_edge("answer", END)
+else:
+    graph.add_edge("context", "validation")
+    graph.add_edge("validation", "summary")
 graph.add_edge("summary", END)
 
 workflow = graph.compile()
 
-@app.get("/chat")
-async def chat(query: str):
-    state: AgentState = {
+@app.get("/ready")
+async def ready():
+    if shared_memory is None:
+        return JSONResponse(status_code=503, content={"ready": False, "memory": None})
+    status = await asyncio.to_thread(shared_memory.status)
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+def initial_state(query: str) -> AgentState:
+    return {
         "query": query,
         "plan": {},
         "research_results": [],
         "validated_results": [],
         "final_answer": "",
         "logs": []
-        }
-    result = await workflow.ainvoke(state)
-    return result
+    }
+
+def sse(event: dict, event_id: str = None) -> str:
+    prefix = f"id: {event_id}\n" if event_id else ""
+    return f"{prefix}data: {json.dumps(event)}\n\n"
+
+def node_complete_event(node: str, state: AgentState) -> dict:
+    """SSE 'complete' event for a finished graph node (None for internal nodes)."""
+    if node == "context":
+        return None
+    if node == "manager":
+        strategy = state["plan"].get("strategy", "unknown")
+        return {"type": "agent", "agent": "Manager", "status": "complete", "message": f"Strategy: {strategy}"}
+    if node == "research":
+        return {"type": "agent", "agent": "Research", "status": "complete",
+                "message": f"Found {len(state['research_results'])} results"}
+    if node == "validation":
+        return {"type": "agent", "agent": "Validation", "status": "complete",
+                "message": f"Validated {len(state['validated_results'])} facts"}
+    return {"type": "agent", "agent": "Summary", "status": "complete", "message": "Summary generated"}
+
+answer_cache = SemanticCache(
+    threshold=config.ANSWER_CACHE_THRESHOLD,
+    maxsize=config.ANSWER_CACHE_SIZE,
+    ttl=config.ANSWER_CACHE_TTL,
+)
+
+async def lookup_answer(query: str, threshold: float = None):
+    """Return (query embedding, cached answer or None) from the semantic answer cache."""
+    if not config.ANSWER_CACHE_ENABLED or shared_memory is None:
+        return None, None
+    try:
+        embedding = (await asyncio.to_thread(shared_memory.embed_queries, [query]))[0]
+    except Exception as e:
+        print(f"Answer cache lookup failed: {e}")
+        return None, None
+    return embedding, answer_cache.lookup(query, embedding, threshold)
+
+def remember_answer(query: str, embedding, state: AgentState):
+    if not config.ANSWER_CACHE_ENABLED:
+        return
+    strategy = state["plan"].get("strategy")
+    if embedding is None or not state["final_answer"] or strategy not in config.ANSWER_CACHE_STRATEGIES:
+        return
+    # Answers that depend on fresh web results expire sooner
+    ttl = config.ANSWER_CACHE_WEB_TTL if strategy in ("web_research", "hybrid") else config.ANSWER_CACHE_TTL
+    answer_cache.store(query, embedding, {
+        "plan": dict(state["plan"]),
+        "validated_results": list(state["validated_results"]),
+        "final_answer": state["final_answer"],
+        "logs": list(state["logs"]),
+    }, ttl=ttl)
+
+def cached_state(query: str, cached: dict) -> AgentState:
+    state = initial_state(query)
+    state["plan"] = {**cached["plan"], "cached": True}
+    state["validated_results"] = list(cached["validated_results"])
+    state["final_answer"] = cached["final_answer"]
+    state["logs"] = cached["logs"] + ["Answer served from semantic cache."]
+    return state
+
+@app.get("/stats")
+async def stats():
+    # Counting documents and sizing the store touch the disk; keep that off the event loop
+    lifecycle = await asyncio.to_thread(shared_memory.lifecycle_stats) if shared_memory else None
+    return {
+        "memory_cache": shared_memory.cache_stats() if shared_memory else None,
+        "memory_lifecycle": lifecycle,
+        "answer_cache": answer_cache.stats(),
+        "router": manager.router.stats(),
+        "speculation": manager.speculator.stats(),
+        "page_fetch": research.fetcher.stats(),
+        "context_packing": packer.stats(),
+        "admission": admission.stats(),
+        "coalescing": {"in_flight": len(flights),
+                       "coalesced": {e: COALESCED.value(endpoint=e) for e in ("chat", "stream")}},
+        "streams": {"runs": len(runs), "max_runs": runs.maxsize,
+                    "resumed": {f: RESUMED.value(found=f) for f in ("true", "false")}},
+    }
+
+CACHE_STATS = metrics.register(metrics.Gauge("research_cache", "Cache counters", ("cache", "stat")))
+ADMISSION_STATS = metrics.register(metrics.Gauge("research_admission", "Admission control state and counters", ("stat",)))
+MEMORY_STATS = metrics.register(metrics.Gauge("research_memory", "Memory store size and eviction counters", ("stat",)))
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    caches = {"answer": answer_cache.stats()}
+    if shared_memory is not None:
+        caches["query_embedding"] = shared_memory.embedding_cache.stats()
+        caches["memory_search"] = shared_memory.search_cache.stats()
+    for cache, values in caches.items():
+        for stat, value in values.items():
+            CACHE_STATS.set(value, cache=cache, stat=stat)
+    if shared_memory is not None:
+        lifecycle = await asyncio.to_thread(shared_memory.lifecycle_stats)
+        for stat, value in lifecycle.items():
+            if value is not None:
+                MEMORY_STATS.set(value, stat=stat)
+    for stat, value in admission.stats().items():
+        ADMISSION_STATS.set(float(value), stat=stat)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def finish_trace(trace, endpoint: str, state: AgentState) -> dict:
+    """Record request metrics and return the fields added to the response / complete event."""
+    strategy = "cached" if state["plan"].get("cached") else state["plan"].get("strategy", "unknown")
+    summary = trace.summary()
+    metrics.REQUESTS.inc(endpoint=endpoint, strategy=strategy)
+    metrics.REQUEST_SECONDS.observe(summary["total"], endpoint=endpoint)
+    fields = {"trace_id": trace.trace_id}
+    if config.INCLUDE_TIMINGS:
+        fields["timings"] = summary["stages"]
+        fields["tokens"] = summary["tokens"]
+    return fields
+
+@app.post("/ingest")
+async def ingest_documents(force: bool = False):
+    """Ingest files under DATA_DIR into memory (unchanged files are skipped)."""
+    from backend.ingest import ingest
+
+    if shared_memory is None:
+        return JSONResponse(status_code=503, content={"error": "Memory not available"})
+    return await asyncio.to_thread(ingest, None, force, shared_memory)
+
+# In-flight pipelines by normalized query
+flights: dict = {}
+# Recent runs by run ID (in flight or finished), so dropped streams can resume
+runs = TTLCache(maxsize=config.STREAM_MAX_RUNS, ttl=config.STREAM_RUN_TTL)
+RESUMED = metrics.register(metrics.Counter(
+    "research_stream_resumes_total", "Streams resumed with Last-Event-ID", ("found",)))
+COALESCED = metrics.register(metrics.Counter(
+    "research_coalesced_requests_total", "Requests that joined an identical in-flight pipeline", ("endpoint",)))
+
+class Flight:
+    """
+    One in-flight pipeline run shared by every identical concurrent request.
+
+    The pipeline runs as its own task, detached from any client, and appends
+    numbered SSE-shaped events to a bounded buffer; streaming subscribers
+    replay what was already emitted (or everything after a Last-Event-ID)
+    and then follow live, non-streaming callers just await the final state.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.key = normalize_query(query)
+        self.trace = metrics.Trace()
+        self.run_id = self.trace.trace_id
+        self.events: deque = deque(maxlen=config.STREAM_BUFFER_EVENTS)  # (seq, event)
+        self._seq = itertools.count(1)
+        self.state: AgentState = None
+        self.error: Exception = None
+        self.subscribers = 0
+        self.done = asyncio.Event()
+        self.admitted = asyncio.Event()  # set once the run has a slot (or has finished)
+        self._changed = asyncio.Event()
+        self.task = None
+
+    def emit(self, event: dict):
+        self.events.append((next(self._seq), event))
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def finish(self, state: AgentState = None, error: Exception = None):
+        self.state, self.error = state, error
+        self.done.set()
+        self.admitted.set()
+        self._changed.set()
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[Tuple[int, dict]]:
+        """
+        (seq, event) pairs numbered after `after`, then live ones until the run finishes.
+        Events that already fell out of the buffer are skipped.
+        """
+        sent = after
+        while True:
+            changed = self._changed
+            if self.events:
+                start = max(0, sent + 1 - self.events[0][0])
+                for seq, event in list(itertools.islice(self.events, start, None)):
+                    yield seq, event
+                    sent = seq
+            if self.done.is_set() and (not self.events or sent >= self.events[-1][0]):
+                return
+            await changed.wait()
+
+    async def result(self) -> AgentState:
+        await self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.state
+
+async def run_pipeline(flight: Flight):
+    """Run (or replay from the answer cache) one query, publishing events to the flight."""
+    query = flight.query
+    metrics.set_trace(flight.trace)
+    acquired_at = None
+    try:
+        # Cached answers need no pipeline slot; under load, accept looser matches
+        degraded = admission.degraded
+        if degraded:
+            admission.counters["degraded"] += 1
+        embedding, cached = await lookup_answer(query, config.DEGRADED_CACHE_THRESHOLD if degraded else None)
+        if not cached:
+            acquired_at = await admission.acquire(PRIORITY_INTERACTIVE)
+        flight.admitted.set()
+        flight.emit({"type": "start", "message": "Starting research...", "run_id": flight.run_id})
+        if cached:
+            # Replay the cached answer with the same event types as a live run
+            state = cached_state(query, cached)
+            flight.emit({"type": "agent", "agent": "Manager", "status": "complete", "message": "Cached answer"})
+            flight.emit({"type": "summary_start"})
+            flight.emit({"type": "summary_chunk", "content": state["final_answer"]})
+            flight.emit({"type": "agent", "agent": "Summary", "status": "complete", "message": "Summary generated"})
+        else:
+            state = initial_state(query)
+            # "custom" carries running/token events written by the nodes, "updates" the node results
+            async for mode, chunk in workflow.astream(state, stream_mode=["custom", "updates"]):
+                if mode == "custom":
+                    flight.emit(chunk)
+                    continue
+                for node, update in chunk.items():
+                    if update:
+                        state.update(update)
+                    event = node_complete_event(node, state)
+                    if event:
+                        flight.emit(event)
+            remember_answer(query, embedding, state)
+        flight.emit({"type": "complete", "final_answer": state["final_answer"], "logs": state["logs"]})
+        flight.finish(state)
+    except Overloaded as e:
+        flight.finish(error=e)
+    except Exception as e:
+        print(f"Pipeline failed for {query!r}: {e}")
+        flight.emit({"type": "error", "message": str(e)})
+        flight.finish(error=e)
+    finally:
+        if acquired_at is not None:
+            admission.release(acquired_at)
+        if flights.get(flight.key) is flight:
+            del flights[flight.key]
+        # Restart the TTL so finished runs stay resumable for STREAM_RUN_TTL
+        runs.set(flight.run_id, flight)
+
+def overloaded_response(error: Overloaded) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"error": str(error)},
+                        headers={"Retry-After": str(error.retry_after)})
+
+def join_flight(query: str, endpoint: str) -> Flight:
+    """Attach to the in-flight pipeline for this query, starting one if there is none."""
+    flight = flights.get(normalize_query(query)) if config.COALESCE_REQUESTS else None
+    if flight is None:
+        flight = Flight(query)
+        runs.set(flight.run_id, flight)
+        if config.COALESCE_REQUESTS:
+            flights[flight.key] = flight
+        # Detached from the request so one client disconnecting doesn't cancel the others
+        flight.task = asyncio.create_task(run_pipeline(flight))
+    else:
+        COALESCED.inc(endpoint=endpoint)
+    flight.subscribers += 1
+    return flight
+
+@app.get("/chat")
+async def chat(query: str, response: Response):
+    flight = join_flight(query, "chat")
+    response.headers["X-Trace-Id"] = flight.trace.trace_id
+    try:
+        result = await flight.result()
+    except Overloaded as e:
+        return overloaded_response(e)
+    return {**result, **finish_trace(flight.trace, "chat", result)}
+
+def resume_flight(last_event_id: str) -> Tuple[Optional[Flight], int]:
+    """Find the run a Last-Event-ID ("<run_id>:<seq>") belongs to; (None, 0) if it expired."""
+    run_id, _, seq = (last_event_id or "").partition(":")
+    flight = runs.get(run_id) if run_id else None
+    RESUMED.inc(found=str(flight is not None).lower())
+    if flight is None or not seq.isdigit():
+        return None, 0
+    return flight, int(seq)
 
 @app.get("/chat/stream")
-async def chat_stream(query: str):
+async def chat_stream(query: str, last_event_id: Optional[str] = Header(None)):
+    # A reconnect carrying Last-Event-ID continues the same run instead of starting a new one
+    flight, after = resume_flight(last_event_id) if last_event_id else (None, 0)
+    if flight is None:
+        flight = join_flight(query, "stream")
+        # Reject before the stream starts so clients get a real 429
+        await flight.admitted.wait()
+        if isinstance(flight.error, Overloaded):
+            return overloaded_response(flight.error)
+
     async def event_generator():
-        # Initialize state
-        state: AgentState = {
-            "query": query,
-            "plan": {},
-            "research_results": [],
-            "validated_results": [],
-            "final_answer": "",
-            "logs": []
-        }
-        
-        # Send initial event
-        yield f"data: {json.dumps({'type': 'start', 'message': 'Starting research...'})}\n\n"
-        await asyncio.sleep(0.1)
-        
-        # Manager Agent
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Manager', 'status': 'running'})}\n\n"
-        state = manager_node(state)
-        strategy = state["plan"].get("strategy", "unknown")
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Manager', 'status': 'complete', 'message': f'Strategy: {strategy}'})}\n\n"
-        await asyncio.sleep(0.1)
-        
-        # Research Agent
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Research', 'status': 'running'})}\n\n"
-        state = research_node(state)
-        research_count = len(state["research_results"])
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Research', 'status': 'complete', 'message': f'Found {research_count} results'})}\n\n"
-        await asyncio.sleep(0.1)
-        
-        # Validation Agent
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Validation', 'status': 'running'})}\n\n"
-        state = validation_node(state)
-        validation_count = len(state["validated_results"])
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Validation', 'status': 'complete', 'message': f'Validated {validation_count} facts'})}\n\n"
-        await asyncio.sleep(0.1)
-        
-        # Summary Agent - with streaming
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Summary', 'status': 'running'})}\n\n"
-        
-        # Prepare the prompt for summary
-        validated_result = state["validated_results"]
-        prompt = f"""
-            Create a clear and short answer using the validated facts below.
-            Keep it under 5 bullet points.
-
-            Validated facts:
-            {validated_result}
-            """
-        
-        # Stream the summary generation
-        yield f"data: {json.dumps({'type': 'summary_start'})}\n\n"
-        
-        summary_text = ""
-        for chunk in call_llm_stream(prompt):
-            summary_text += chunk
-            yield f"data: {json.dumps({'type': 'summary_chunk', 'content': chunk})}\n\n"
-            await asyncio.sleep(0.01)  # Small delay for smooth streaming
-        
-        state["final_answer"] = summary_text
-        state["logs"].append("Summary agent generated a final answer.")
-        
-        yield f"data: {json.dumps({'type': 'agent', 'agent': 'Summary', 'status': 'complete', 'message': 'Summary generated'})}\n\n"
-        
-        # Send final complete event with full state
-        yield f"data: {json.dumps({'type': 'complete', 'final_answer': state['final_answer'], 'logs': state['logs']})}\n\n"
-    
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+        async for seq, event in flight.subscribe(after):
+            if event["type"] == "complete":
+                # Send final complete event with full state
+                event = {**event, **finish_trace(flight.trace, "stream", flight.state)}
+            yield sse(event, f"{flight.run_id}:{seq}")
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream",
+                             headers={"X-Trace-Id": flight.trace.trace_id, "X-Run-Id": flight.run_id})
+
+async def research_batch(queries: List[str], concurrency: int = None) -> AsyncIterator[dict]:
+    """
+    Run many queries as one batch, yielding each result as soon as it finishes.
+
+    All queries are embedded in one batch, checked against the answer cache,
+    planned together (one multi-query Chroma call, classifications bounded
+    like the pipelines) and then run through the research/validation/summary
+    graph with at most `concurrency` in flight.
+
+    Args:
+        queries: Questions to answer
+        concurrency: Pipelines run at once (default BATCH_CONCURRENCY)
+
+    Yields:
+        Result dicts with the query's `index` in the input list, in completion order
+    """
+    concurrency = max(1, min(concurrency or config.BATCH_CONCURRENCY, config.BATCH_MAX_CONCURRENCY))
+    embeddings = [None] * len(queries)
+    if shared_memory is not None and queries:
+        try:
+            embeddings = await asyncio.to_thread(shared_memory.embed_queries, queries)
+        except Exception as e:
+            print(f"Batch embedding failed: {e}")
+
+    pending = []
+    for index, (query, embedding) in enumerate(zip(queries, embeddings)):
+        cached = None
+        if config.ANSWER_CACHE_ENABLED and embedding is not None:
+            cached = answer_cache.lookup(query, embedding)
+        if cached:
+            yield {"index": index, **cached_state(query, cached)}
+        else:
+            pending.append(index)
+    if not pending:
+        return
+
+    # Classification calls the LLM: same concurrency bound and batch priority as the pipelines
+    states = await manager.plan_many([initial_state(queries[i]) for i in pending],
+                                     [embeddings[i] for i in pending], concurrency=concurrency,
+                                     slot=lambda: admission.slot(PRIORITY_BATCH, bounded=False))
+    await research.prefetch(states)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, state: AgentState) -> dict:
+        async with semaphore:
+            trace = start_trace()
+            acquired_at = None
+            try:
+                # Batch work queues behind interactive requests but is never rejected for a full queue
+                acquired_at = await admission.acquire(PRIORITY_BATCH, bounded=False)
+                result = await workflow.ainvoke(state)
+            except Exception as e:
+                print(f"Batch query {index} failed: {e}")
+                return {"index": index, "query": queries[index], "error": str(e)}
+            finally:
+                if acquired_at is not None:
+                    admission.release(acquired_at)
+            remember_answer(queries[index], embeddings[index], result)
+            return {"index": index, **result, **finish_trace(trace, "batch", result)}
+
+    tasks = [asyncio.create_task(run_one(i, state)) for i, state in zip(pending, states)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The client went away (or the caller stopped iterating): don't keep working
+        for task in tasks:
+            task.cancel()
+
+class BatchRequest(BaseModel):
+    queries: List[str]
+    concurrency: Optional[int] = None
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchRequest, format: str = "ndjson"):
+    """Answer a list of queries, streaming results as NDJSON lines (or SSE with format=sse)."""
+    if len(request.queries) > config.BATCH_MAX_QUERIES:
+        return JSONResponse(status_code=413, content={
+            "error": f"At most {config.BATCH_MAX_QUERIES} queries per batch"})
+
+    async def results():
+        async for result in research_batch(request.queries, request.concurrency):
+            if format == "sse":
+                yield sse({"type": "result", **result})
+            else:
+                yield json.dumps(result) + "\n"
+        if format == "sse":
+            yield sse({"type": "complete", "count": len(request.queries)})
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(results(), media_type=media_type)
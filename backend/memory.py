@@ -1,122 +1,707 @@
 # ChromaDB + embeddings
 
-import chromadb
-from sentence_transformers import SentenceTransformer
 from typing import List, Union
+import os
+import queue
+import threading
+import time
 import uuid
 import hashlib
 
+from backend import config
+from backend.cache import TTLCache, normalize_query
+from backend.embeddings import load_embedder
+from backend.metrics import record_embedding_batch, record_error, span, traced
+from backend.lexical import BM25Index, rrf
+from backend.vector_store import open_store
+
 class Memory:
-    def __init__(self):
-        # Use PersistentClient to save data across sessions
-        self.client = chromadb.PersistentClient(path="./chroma_db")
-        self.collection = self.client.get_or_create_collection("research_assistant")
+    def __init__(self, path: str = None, collection_name: str = None, model_name: str = None,
+                 batch_size: int = None, backend: str = None, embedding_backend: str = None):
+        # Persistent store (Chroma or the NumPy index, see MEMORY_BACKEND), opened on first use
+        self.collection_name = collection_name or config.COLLECTION_NAME
+        self.model_name = model_name or config.EMBEDDING_MODEL
+        self.batch_size = batch_size or config.EMBED_BATCH_SIZE
+        self.path = path or config.CHROMA_PATH
+        self.backend = backend or config.MEMORY_BACKEND
+        self.embedding_backend = embedding_backend or config.EMBEDDING_BACKEND
+        self._collection = None
+        self._store_lock = threading.Lock()
         self._model = None  # Lazy load the model
+        self._model_lock = threading.Lock()
+
+        # Query embeddings never go stale; search results and the document
+        # count are dropped whenever the collection changes. The count also
+        # expires after MEMORY_COUNT_TTL, since other processes (ingestion)
+        # may write to the same store.
+        self.embedding_cache = TTLCache(maxsize=config.QUERY_CACHE_SIZE, ttl=config.QUERY_CACHE_TTL)
+        self.search_cache = TTLCache(maxsize=config.QUERY_CACHE_SIZE, ttl=config.QUERY_CACHE_TTL)
+        self._count = None
+        self._count_expires = 0.0
+        self._generation = 0  # bumped on every local write, so in-flight reads don't cache stale values
+        self._disk_usage = (None, 0.0)  # (bytes, expires at)
+
+        # Write-behind queue drained by a background thread (started on first use)
+        self._write_queue = queue.Queue(maxsize=config.WRITE_BEHIND_QUEUE_SIZE)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+        # Lifecycle: search hits are buffered here and written back by maintain()
+        self._hits = {}
+        self._hits_lock = threading.Lock()
+        self._maintenance_lock = threading.Lock()
+
+        # BM25 over stored documents; store writes are mirrored into it under this lock
+        self.lexical = BM25Index()
+        self._lexical_lock = threading.Lock()
+        self.lifecycle = {"evicted_ttl": 0, "evicted_lru": 0, "merged": 0,
+                          "maintenance_runs": 0, "last_maintenance": None}
+        self._compacted_until = 0.0  # created_at up to which near-duplicates were already merged
 
     @property
     def model(self):
         """Lazy load the embedding model only when needed"""
         if self._model is None:
-            try:
-                print("Loading SentenceTransformer model...")
-                self._model = SentenceTransformer("all-MiniLM-L6-v2")
-                print("Model loaded successfully!")
-            except Exception as e:
-                print(f"Warning: Could not load embedding model: {e}")
-                print("Memory features will be disabled.")
-                # Return a dummy model that raises an error if used
-                raise RuntimeError("Embedding model not available. Check your internet connection.")
+            # Agents share one Memory, so guard against two threads loading the model at once
+            with self._model_lock:
+                if self._model is None:
+                    try:
+                        print(f"Loading embedding model ({self.embedding_backend})...")
+                        self._model = load_embedder(self.embedding_backend, self.model_name)
+                        print("Model loaded successfully!")
+                    except Exception as e:
+                        print(f"Warning: Could not load embedding model: {e}")
+                        print("Memory features will be disabled.")
+                        # Return a dummy model that raises an error if used
+                        raise RuntimeError("Embedding model not available. Check your internet connection.")
         return self._model
 
-    def save(self, data: Union[str, List[str]], query: str = None, metadata: dict = None):
+    @property
+    def collection(self):
+        """The vector store, opened on first access so importing the app stays cheap."""
+        if self._collection is None:
+            with self._store_lock:
+                if self._collection is None:
+                    self._collection = open_store(self.backend, self.path, self.collection_name)
+        return self._collection
+
+    @property
+    def ready(self) -> bool:
+        """True once the embedding model and collection are loaded."""
+        return self._model is not None and self._collection is not None
+
+    def warm_up(self) -> bool:
+        """
+        Eagerly load the embedding model and run one encode so the first
+        request does not pay for model load or first-call initialization.
+
+        Returns:
+            True if the model and collection are ready
+        """
+        try:
+            self.model.encode("warm up")
+            self.count()
+        except Exception as e:
+            print(f"Memory warm-up failed: {e}")
+        return self.ready
+
+    def status(self) -> dict:
+        """Readiness details for health checks."""
+        try:
+            count = self.collection.count()
+        except Exception:
+            count = None
+        return {
+            "ready": self.ready,
+            "model_loaded": self._model is not None,
+            "model": self.model_name,
+            "embedding_backend": self.embedding_backend,
+            "backend": self.backend,
+            "collection": self.collection_name,
+            "documents": count,
+            "cache": self.cache_stats(),
+            "lifecycle": self.lifecycle_stats(),
+        }
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for the query embedding and search result caches."""
+        return {
+            "embeddings": self.embedding_cache.stats(),
+            "search": self.search_cache.stats(),
+        }
+
+    def _invalidate(self):
+        """Forget cached search results and document count after a write."""
+        self._generation += 1
+        self.search_cache.clear()
+        self._count = None
+
+    def count(self, fresh: bool = False) -> int:
+        """Number of stored documents, cached until the next local write or for MEMORY_COUNT_TTL seconds."""
+        count = self._count
+        if fresh or count is None or time.monotonic() >= self._count_expires:
+            generation = self._generation
+            count = self.collection.count()
+            # A write that finished while we were counting makes this value stale; don't keep it
+            if generation == self._generation:
+                self._count = count
+                self._count_expires = time.monotonic() + config.MEMORY_COUNT_TTL
+                if self.lexical.loaded and count != len(self.lexical):
+                    # Another process (e.g. the ingest CLI) changed the store; BM25 catches up on the next search
+                    self.lexical.loaded = False
+        return count
+
+    @traced("embed")
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Encode texts in batches of `batch_size`.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding (list of floats) per input text
+        """
+        if not texts:
+            return []
+        record_embedding_batch(len(texts))
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        return [embedding.tolist() for embedding in embeddings]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed queries, reusing cached embeddings for normalized queries seen recently.
+
+        Args:
+            queries: Query strings
+
+        Returns:
+            One embedding per query
+        """
+        keys = [normalize_query(q) for q in queries]
+        embeddings = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fresh = self.embed([queries[i] for i in missing])
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+                self.embedding_cache.set(keys[i], embedding)
+        return embeddings
+
+    @staticmethod
+    def doc_id(text: str) -> str:
+        """Stable document ID derived from the text hash."""
+        return f"doc_{hashlib.md5(text.encode()).hexdigest()}"
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        """Return the subset of `ids` already stored in the collection."""
+        if not ids:
+            return set()
+        found = self.collection.get(ids=ids, include=[])
+        return set(found.get("ids", []))
+
+    @traced("memory.save")
+    def save(self, data: Union[str, List[str]], query: str = None,
+             metadata: Union[dict, List[dict]] = None, raise_errors: bool = False,
+             ids: List[str] = None) -> int:
         """
         Save text or list of texts to memory.
-        
+
+        Texts whose hash is already stored are skipped without being
+        re-embedded; the rest are embedded in batches and upserted, so a
+        single duplicate never causes the whole batch to be dropped.
+
         Args:
             data: Single text string or list of text strings
             query: Optional query that generated this data
-            metadata: Optional metadata dict
+            metadata: Optional metadata dict, or one dict per text (e.g. url/title)
+            raise_errors: Re-raise embedding/store errors instead of returning 0
+                (for callers that must not record a failed write as done)
+            ids: Optional document ID per text instead of the text hash (so the
+                same text from two sources is stored twice)
+
+        Returns:
+            Number of new documents stored
         """
         try:
             # Convert single string to list for uniform processing
             texts = [data] if isinstance(data, str) else data
-            
-            embeddings = []
-            documents = []
-            metadatas = []
-            ids = []
-            
-            for text in texts:
+            if isinstance(metadata, list):
+                per_text = metadata
+            else:
+                per_text = [metadata] * len(texts)
+
+            doc_ids = ids or [self.doc_id(text) if text else None for text in texts]
+
+            # Drop empty texts and in-batch duplicates, keeping first occurrence
+            pending = {}
+            for doc_id, text, text_meta in zip(doc_ids, texts, per_text):
                 if not text or not text.strip():
                     continue
-                    
-                embedding = self.model.encode(text).tolist()
-                embeddings.append(embedding)
-                documents.append(text)
-                
-                # Create metadata
-                meta = metadata.copy() if metadata else {}
+                pending.setdefault(doc_id, (text, text_meta))
+
+            existing = self._existing_ids(list(pending))
+            ids = [doc_id for doc_id in pending if doc_id not in existing]
+            if not ids:
+                return 0
+
+            documents = [pending[doc_id][0] for doc_id in ids]
+            metadatas = []
+            now = time.time()
+            for doc_id in ids:
+                meta = dict(pending[doc_id][1] or {})
                 if query:
                     meta["query"] = query
+                meta.update(created_at=now, last_hit=now, hits=0)
                 metadatas.append(meta)
-                
-                # Generate unique ID from text hash
-                text_hash = hashlib.md5(text.encode()).hexdigest()
-                ids.append(f"doc_{text_hash}")
-            
-            if embeddings:
-                try:
-                    self.collection.add(
-                        embeddings=embeddings,
-                        documents=documents,
-                        metadatas=metadatas,
-                        ids=ids
-                    )
-                except Exception as e:
-                    # Handle duplicate IDs gracefully
-                    print(f"Memory save warning: {e}")
+
+            embeddings = self.embed(documents)
+
+            for i in range(0, len(ids), self.batch_size):
+                batch = slice(i, i + self.batch_size)
+                self.collection.upsert(
+                    embeddings=embeddings[batch],
+                    documents=documents[batch],
+                    metadatas=metadatas[batch],
+                    ids=ids[batch]
+                )
+            with self._lexical_lock:
+                self.lexical.add(zip(ids, documents))
+            self._invalidate()
+            return len(ids)
         except RuntimeError as e:
+            record_error("memory.save")
             print(f"Cannot save to memory: {e}")
-            return
+            if raise_errors:
+                raise
+            return 0
+        except Exception as e:
+            record_error("memory.save")
+            print(f"Memory save error: {e}")
+            if raise_errors:
+                raise
+            return 0
+
+    def save_later(self, data: Union[str, List[str]], query: str = None,
+                   metadata: Union[dict, List[dict]] = None) -> bool:
+        """
+        Queue texts to be saved by the background writer instead of on the caller's thread.
+
+        Args:
+            data: Single text string or list of text strings
+            query: Optional query that generated this data
+            metadata: Optional metadata dict, or one dict per text
 
-    def search(self, query: str, k: int = 3):
+        Returns:
+            False if the queue is full and the write was dropped
+        """
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._drain_writes, name="memory-writer", daemon=True)
+                    self._writer.start()
+        try:
+            self._write_queue.put_nowait((data, query, metadata))
+            return True
+        except queue.Full:
+            print("Memory write queue full, dropping write.")
+            return False
+
+    def _drain_writes(self):
+        while True:
+            data, query, metadata = self._write_queue.get()
+            try:
+                self.save(data, query=query, metadata=metadata)
+            finally:
+                self._write_queue.task_done()
+
+    def flush(self):
+        """Block until every queued write (and buffered hit count) has been saved."""
+        self._write_queue.join()
+        try:
+            self._flush_hits()
+        except Exception as e:
+            print(f"Could not save memory hit counts: {e}")
+
+    def search(self, query: str, k: int = 3, source: str = None, source_query: str = None,
+               max_age: float = None):
         """
         Search for similar documents in memory.
         
         Args:
             query: Search query
             k: Number of results to return
+            source: Only documents ingested from this source file
+            source_query: Only documents saved for this originating query
+            max_age: Only documents saved within the last `max_age` seconds
             
         Returns:
             List of document strings, or empty list if no results
         """
+        return self.search_many([query], k=k, source=source, source_query=source_query, max_age=max_age)[0]
+
+    @staticmethod
+    def where(source: str = None, source_query: str = None, max_age: float = None) -> dict:
+        """Store-side metadata filter for the given constraints (None when unfiltered)."""
+        clauses = []
+        if source:
+            clauses.append({"source": source})
+        if source_query:
+            clauses.append({"query": source_query})
+        if max_age:
+            clauses.append({"created_at": {"$gte": time.time() - max_age}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    @traced("memory.search")
+    def search_many(self, queries: List[str], k: int = 3, source: str = None, source_query: str = None,
+                    max_age: float = None) -> List[List[str]]:
+        """
+        Search for several queries with one batched encode and one store query.
+
+        With HYBRID_SEARCH on, dense candidates are fused with BM25 matches by
+        reciprocal rank, so exact terms (names, version numbers) are found even
+        when their embeddings are not the closest. Filters are applied by the
+        store for dense results and to the lexical candidates.
+
+        Args:
+            queries: Search queries
+            k: Number of results to return per query
+            source, source_query, max_age: Metadata filters, see search()
+
+        Returns:
+            One list of document strings per query (empty when nothing matches)
+        """
+        empty = [[] for _ in queries]
+        if not queries:
+            return empty
         try:
-            # Check if collection is empty
-            count = self.collection.count()
+            # Check if collection is empty (a cached 0 is re-checked: another process may have written since)
+            count = self.count()
             if count == 0:
-                return []
-            
-            embedding = self.model.encode(query).tolist()
-            results = self.collection.query(
-                query_embeddings=[embedding],
-                n_results=min(k, count)
-            )
-            
-            # Extract documents from results
-            if results and "documents" in results and results["documents"]:
-                return results["documents"][0]  # First query's results
-            return []
+                count = self.count(fresh=True)
+            if count == 0:
+                return empty
+
+            filters = (source, source_query, max_age)
+            keys = [(normalize_query(q), k, filters) for q in queries]
+            # Cached as (ids, documents) so cache hits still count towards LRU
+            matches = [self.search_cache.get(key) for key in keys]
+            missing = [i for i, match in enumerate(matches) if match is None]
+            if not missing:
+                return self._record_hits(matches)
+
+            generation = self._generation
+            where = self.where(*filters)
+            depth = max(k, config.HYBRID_CANDIDATES) if config.HYBRID_SEARCH else k
+            embeddings = self.embed_queries([queries[i] for i in missing])
+            with span(f"{self.backend}.query"):
+                results = self.collection.query(
+                    query_embeddings=embeddings,
+                    n_results=min(depth, count),
+                    where=where,
+                )
+
+            # Extract documents from results, one list per query
+            found = results.get("documents") if results else None
+            found_ids = results.get("ids") if results else None
+            for n, i in enumerate(missing):
+                docs = (found[n] if found and n < len(found) else None) or []
+                ids = (found_ids[n] if found_ids and n < len(found_ids) else None) or []
+                if config.HYBRID_SEARCH:
+                    ids, docs = self._fuse(queries[i], list(ids), list(docs), k, depth, where)
+                matches[i] = (list(ids[:k]), list(docs[:k]))
+                if generation == self._generation:
+                    self.search_cache.set(keys[i], matches[i])
+            return self._record_hits(matches)
         except RuntimeError as e:
+            record_error("memory.search")
             print(f"Cannot search memory: {e}")
-            return []
+            return empty
         except Exception as e:
+            record_error("memory.search")
             print(f"Memory search error: {e}")
-            return []
-    
+            return empty
+
+    def _lexical_index(self) -> BM25Index:
+        """
+        BM25 index over all stored documents, built from the store on first use
+        and synced again (by ID, so only new documents are fetched) after
+        count() saw the store change without a local write.
+        """
+        if not self.lexical.loaded:
+            with self._lexical_lock:
+                if not self.lexical.loaded:
+                    stored = self.collection.get(include=[])["ids"]
+                    current = set(stored)
+                    self.lexical.remove([doc_id for doc_id in self.lexical.ids() if doc_id not in current])
+                    missing = [doc_id for doc_id in stored if doc_id not in self.lexical]
+                    step = self.batch_size * 32
+                    for i in range(0, len(missing), step):
+                        found = self.collection.get(ids=missing[i:i + step], include=["documents"])
+                        self.lexical.add(zip(found["ids"], found["documents"]))
+                    self.lexical.loaded = True
+        return self.lexical
+
+    def _fuse(self, query: str, dense_ids: List[str], dense_docs: List[str], k: int, depth: int,
+              where: dict = None):
+        """Merge dense and BM25 rankings with reciprocal-rank fusion; returns (ids, documents)."""
+        with span("bm25.search"):
+            # Filtered searches look deeper since some lexical candidates will be dropped
+            lexical = [doc_id for doc_id, _ in self._lexical_index().search(query, depth * 4 if where else depth)]
+        if lexical and where:
+            allowed = set(self.collection.get(ids=lexical, include=[], where=where)["ids"])
+            lexical = [doc_id for doc_id in lexical if doc_id in allowed]
+        if not lexical:
+            return dense_ids, dense_docs
+
+        fused = rrf([dense_ids, lexical], k=config.RRF_K)[:k]
+        documents = dict(zip(dense_ids, dense_docs))
+        extra = [doc_id for doc_id in fused if doc_id not in documents]
+        if extra:
+            stored = self.collection.get(ids=extra, include=["documents"])
+            documents.update(zip(stored["ids"], stored["documents"]))
+        fused = [doc_id for doc_id in fused if doc_id in documents]
+        return fused, [documents[doc_id] for doc_id in fused]
+
+    def _record_hits(self, matches) -> List[List[str]]:
+        """Buffer a hit for every returned document and return the document lists."""
+        now = time.time()
+        with self._hits_lock:
+            for ids, _ in matches:
+                for doc_id in ids:
+                    count, _ = self._hits.get(doc_id, (0, now))
+                    self._hits[doc_id] = (count + 1, now)
+        return [list(docs) for _, docs in matches]
+
+    def _flush_hits(self):
+        """Write buffered hit counts and last-hit times into document metadata."""
+        with self._hits_lock:
+            hits, self._hits = self._hits, {}
+        if not hits:
+            return
+        ids = list(hits)
+        stored = self.collection.get(ids=ids, include=["metadatas"])
+        metadatas = []
+        for doc_id, meta in zip(stored["ids"], stored["metadatas"]):
+            count, last_hit = hits[doc_id]
+            meta = meta or {}
+            metadatas.append({"hits": int(meta.get("hits", 0)) + count, "last_hit": last_hit})
+        if stored["ids"]:
+            self.collection.update(ids=stored["ids"], metadatas=metadatas)
+
+    def _delete(self, ids: List[str]):
+        for i in range(0, len(ids), self.batch_size * 32):
+            self.collection.delete(ids=ids[i:i + self.batch_size * 32])
+        with self._lexical_lock:
+            self.lexical.remove(ids)
+
+    def forget(self, source: str) -> int:
+        """
+        Delete every document ingested from `source` (e.g. before re-ingesting a changed file).
+
+        Returns:
+            Number of documents deleted
+        """
+        ids = self.collection.get(where=self.where(source=source), include=[])["ids"]
+        if ids:
+            self._delete(ids)
+            self._invalidate()
+        return len(ids)
+
+    def maintain(self, max_docs: int = None, max_age: float = None,
+                 compact_threshold: float = None) -> dict:
+        """
+        One lifecycle pass: persist hit counts, evict expired and least
+        recently used documents, then merge near-duplicates.
+
+        Documents saved from ingestion (with a `source`) are never evicted:
+        they neither expire by age nor count towards the size cap, since the
+        ingest manifest would keep them from coming back. They are only
+        replaced when their file changes.
+
+        Args:
+            max_docs: Maximum documents kept (0 = unlimited, default MEMORY_MAX_DOCS)
+            max_age: Seconds a web result is kept (0 = forever, default MEMORY_MAX_AGE)
+            compact_threshold: Cosine similarity at which documents are merged (0 = off)
+
+        Returns:
+            Counts of documents evicted/merged in this pass
+        """
+        max_docs = config.MEMORY_MAX_DOCS if max_docs is None else max_docs
+        max_age = config.MEMORY_MAX_AGE if max_age is None else max_age
+        threshold = config.MEMORY_COMPACT_THRESHOLD if compact_threshold is None else compact_threshold
+        result = {"evicted_ttl": 0, "evicted_lru": 0, "merged": 0}
+
+        with self._maintenance_lock, span("memory.maintain"):
+            try:
+                self._flush_hits()
+                stored = self.collection.get(include=["metadatas"])
+                ids = stored["ids"]
+                metas = [m or {} for m in stored["metadatas"]]
+                now = time.time()
+
+                if max_age:
+                    expired = {doc_id for doc_id, meta in zip(ids, metas)
+                               if "source" not in meta and now - meta.get("created_at", now) > max_age}
+                    if expired:
+                        self._delete(list(expired))
+                        kept = [n for n, doc_id in enumerate(ids) if doc_id not in expired]
+                        ids, metas = [ids[n] for n in kept], [metas[n] for n in kept]
+                        result["evicted_ttl"] = len(expired)
+
+                evictable = [n for n, meta in enumerate(metas) if "source" not in meta]
+                if max_docs and len(evictable) > max_docs:
+                    # Documents never hit since saving are ordered by when they were saved
+                    order = sorted(evictable, key=lambda n: metas[n].get("last_hit", 0))
+                    victims = [ids[n] for n in order[:len(evictable) - max_docs]]
+                    self._delete(victims)
+                    result["evicted_lru"] = len(victims)
+
+                if threshold:
+                    result["merged"] = self.compact(threshold)
+            except Exception as e:
+                record_error("memory.maintain")
+                print(f"Memory maintenance error: {e}")
+            finally:
+                self._invalidate()
+
+            for key, value in result.items():
+                self.lifecycle[key] += value
+            self.lifecycle["maintenance_runs"] += 1
+            self.lifecycle["last_maintenance"] = time.time()
+        return result
+
+    def compact(self, threshold: float, neighbours: int = 8, block: int = 1024) -> int:
+        """
+        Merge near-duplicates of documents added since the previous pass.
+
+        Each new document's nearest stored neighbours are found with a store
+        query; of each group whose embeddings have cosine similarity >=
+        `threshold`, the most-hit document is kept and inherits the others'
+        hit counts. Ingested documents (with a `source`) are never removed,
+        only the web results duplicating them. Older pairs were already checked, so a pass costs
+        O(new documents) queries instead of a full N x N scan (the first pass
+        after startup checks everything once).
+
+        Args:
+            threshold: Cosine similarity at which documents are merged
+            neighbours: Nearest neighbours checked per new document
+
+        Returns:
+            Number of documents removed
+        """
+        import numpy as np
+
+        started = time.time()
+        # Re-check a short overlap: saves in flight during the last pass may carry an earlier created_at
+        where = {"created_at": {"$gt": self._compacted_until - 60}} if self._compacted_until else None
+        fresh = self.collection.get(include=["embeddings"], where=where)
+        fresh_ids = list(fresh["ids"])
+        total = self.count(fresh=True)
+        if not fresh_ids or total < 2:
+            self._compacted_until = started
+            return 0
+
+        def unit(rows):
+            rows = np.asarray(rows, dtype=np.float32)
+            return rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+
+        fresh_vectors = unit(fresh["embeddings"])
+        candidates = {}  # fresh doc -> neighbour IDs
+        for start in range(0, len(fresh_ids), block):
+            found = self.collection.query(query_embeddings=fresh_vectors[start:start + block].tolist(),
+                                          n_results=min(neighbours + 1, total), include=())
+            for doc_id, ids in zip(fresh_ids[start:start + block], found["ids"]):
+                candidates[doc_id] = [n for n in ids if n != doc_id]
+
+        # Exact similarity from the stored embeddings (store distances differ between backends)
+        involved = list(dict.fromkeys(fresh_ids + [n for ids in candidates.values() for n in ids]))
+        stored = self.collection.get(ids=involved, include=["embeddings", "metadatas"])
+        vectors = dict(zip(stored["ids"], unit(stored["embeddings"])))
+        metas = {doc_id: meta or {} for doc_id, meta in zip(stored["ids"], stored["metadatas"])}
+        hits = {doc_id: int(meta.get("hits", 0)) for doc_id, meta in metas.items()}
+
+        removed, keepers = set(), set()
+        for doc_id in fresh_ids:
+            if doc_id in removed or doc_id not in vectors:
+                continue
+            group = [doc_id] + [n for n in candidates.get(doc_id, []) if n in vectors and n not in removed
+                                and float(vectors[doc_id] @ vectors[n]) >= threshold]
+            if len(group) < 2:
+                continue
+            # Most useful document survives, ingested chunks always do
+            pinned = {n for n in group if "source" in metas[n]}
+            keeper = max(pinned or group, key=lambda n: (hits[n], metas[n].get("last_hit", 0)))
+            for victim in group:
+                if victim != keeper and victim not in pinned:
+                    hits[keeper] += hits[victim]
+                    removed.add(victim)
+                    keepers.discard(victim)
+            keepers.add(keeper)
+
+        if removed:
+            keep_ids = list(keepers)
+            self.collection.update(ids=keep_ids, metadatas=[{"hits": hits[n]} for n in keep_ids])
+            self._delete(list(removed))
+        self._compacted_until = started
+        return len(removed)
+
+    def disk_usage(self, max_age: float = 60) -> int:
+        """Bytes used by the persistent store on disk (walks the directory at most every `max_age` seconds)."""
+        cached, expires_at = self._disk_usage
+        if cached is not None and time.monotonic() < expires_at:
+            return cached
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        self._disk_usage = (total, time.monotonic() + max_age)
+        return total
+
+    def lifecycle_stats(self) -> dict:
+        """Collection size and eviction/compaction counters."""
+        try:
+            documents = self.count()
+        except Exception:
+            documents = None
+        return {"documents": documents, "disk_bytes": self.disk_usage(), **self.lifecycle}
+
     def clear(self):
         """Clear all data from memory."""
         try:
-            self.client.delete_collection("research_assistant")
-            self.collection = self.client.get_or_create_collection("research_assistant")
+            self.collection.clear()
+            with self._lexical_lock:
+                self.lexical.clear()
         except Exception as e:
-            print(f"Memory clear error: {e}")
\ No newline at end of file
+            print(f"Memory clear error: {e}")
+        finally:
+            with self._hits_lock:
+                self._hits.clear()
+            self._invalidate()
+
+
+_shared_memory = None
+_shared_lock = threading.Lock()
+
+def get_memory() -> Memory:
+    """
+    Return the process-wide Memory instance, creating it on first use.
+
+    All agents share this instance so the Chroma client and the embedding
+    model are only opened/loaded once per process.
+    """
+    global _shared_memory
+    if _shared_memory is None:
+        with _shared_lock:
+            if _shared_memory is None:
+                _shared_memory = Memory()
+    return _shared_memory
@@ -0,0 +1,213 @@
+# Metrics and per-request tracing (Prometheus text exposition, no extra dependencies)
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _fmt(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> str:
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n" + "".join(self._lines())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _lines(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{self._fmt(key)} {value}\n"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _lines(self):
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                yield f"{self.name}_bucket{self._fmt(key, {'le': bound})} {count}\n"
+            yield f"{self.name}_bucket{self._fmt(key, {'le': '+Inf'})} {series[-1]}\n"
+            yield f"{self.name}_sum{self._fmt(key)} {series[-2]}\n"
+            yield f"{self.name}_count{self._fmt(key)} {series[-1]}\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REQUESTS = Counter("research_requests_total", "Pipeline requests", ("endpoint", "strategy"))
+REQUEST_SECONDS = Histogram("research_request_duration_seconds", "End-to-end request time", ("endpoint",))
+STAGE_SECONDS = Histogram("research_stage_duration_seconds", "Time spent per stage", ("stage",))
+STAGE_ERRORS = Counter("research_stage_errors_total", "Errors raised per stage", ("stage",))
+LLM_TOKENS = Counter("research_llm_tokens_total", "LLM tokens", ("kind",))
+EMBED_BATCH = Histogram("research_embedding_batch_size", "Texts per embedding call", (), SIZE_BUCKETS)
+
+REGISTRY = [REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, STAGE_ERRORS, LLM_TOKENS, EMBED_BATCH]
+
+
+def register(metric: _Metric) -> _Metric:
+    """Add a metric defined elsewhere to the /metrics output."""
+    REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format."""
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    """Timings and token counts collected for one request."""
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or new_trace_id()
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def summary(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "total": round(time.perf_counter() - self.started, 4),
+            "stages": {k: round(v, 4) for k, v in self.timings.items()},
+            "tokens": dict(self.tokens),
+            "errors": dict(self.errors),
+        }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace(trace_id: str = None) -> Trace:
+    """Begin a trace for the current request; tasks and threads started afterwards inherit it."""
+    trace = Trace(trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def set_trace(trace: Trace):
+    """Make an existing trace current (e.g. inside a task that works for several requests)."""
+    _current_trace.set(trace)
+
+
+def current_trace() -> Trace:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block: recorded in the stage histogram and the current request's trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        if not isinstance(e, (GeneratorExit, asyncio.CancelledError)):
+            record_error(stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = current_trace()
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+def record_tokens(prompt: int = 0, completion: int = 0):
+    LLM_TOKENS.inc(prompt or 0, kind="prompt")
+    LLM_TOKENS.inc(completion or 0, kind="completion")
+    trace = current_trace()
+    if trace is not None:
+        trace.tokens["prompt"] += prompt or 0
+        trace.tokens["completion"] += completion or 0
+
+
+def record_embedding_batch(size: int):
+    EMBED_BATCH.observe(size)
+
+
+def record_error(stage: str):
+    """Count an error that was handled (and not re-raised) inside a stage."""
+    STAGE_ERRORS.inc(stage=stage)
+    trace = current_trace()
+    if trace is not None:
+        trace.errors[stage] = trace.errors.get(stage, 0) + 1
+
+
+def traced(stage: str):
+    """Decorator form of span() for synchronous functions."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,157 @@
+# Local query router: keyword rules + embedding centroids, LLM only when unsure
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from backend import config
+
+STRATEGIES = ["direct_answer", "web_research", "memory_retrieval", "hybrid"]
+
+# (pattern, strategy) pairs checked in order; a match is treated as certain
+RULES = [
+    (r"\b(latest|newest|today|tonight|yesterday|this (week|month|year)|right now|currently|breaking|news|"
+     r"price of|stock|weather|score|release date|20[2-9]\d)\b", "web_research"),
+    (r"\b(according to|in|from) (the|our|my) (document|documents|pdf|report|notes|files?|corpus|knowledge base)\b",
+     "memory_retrieval"),
+    (r"^\s*(hi|hello|hey|thanks|thank you|good (morning|evening))\b", "direct_answer"),
+    (r"^\s*(what is|calculate|compute)?\s*[\d\s\.\+\-\*/\^\(\)%=]+\??\s*$", "direct_answer"),
+    (r"^\s*(translate|spell|define|rephrase|paraphrase)\b", "direct_answer"),
+]
+
+# Labelled examples used to build one centroid per strategy
+EXAMPLES: Dict[str, List[str]] = {
+    "direct_answer": [
+        "What is 15% of 200?",
+        "Define photosynthesis.",
+        "What is the capital of France?",
+        "Explain what a linked list is.",
+        "How many days are in a leap year?",
+        "Write a haiku about autumn.",
+        "What does HTTP stand for?",
+        "Convert 10 miles to kilometers.",
+    ],
+    "web_research": [
+        "What are the latest developments in AI regulation?",
+        "Who won the most recent Formula 1 race?",
+        "What is the current price of bitcoin?",
+        "What new features were announced in the last iPhone release?",
+        "What happened in the news today?",
+        "Which companies raised funding this month?",
+        "What is the weather forecast for London this weekend?",
+        "What are the current interest rates set by the Federal Reserve?",
+    ],
+    "memory_retrieval": [
+        "What did the generative AI report say about market potential?",
+        "Summarize the document on generative adversarial networks.",
+        "What challenges of generative AI are listed in our notes?",
+        "What industry use cases are covered in the report?",
+        "Remind me what we found earlier about diffusion models.",
+        "What does the PDF say about the authors' conclusions?",
+    ],
+    "hybrid": [
+        "How does LangGraph compare to other agent frameworks?",
+        "What are the pros and cons of vector databases for RAG?",
+        "Give me an overview of transformer architectures and recent improvements.",
+        "What are best practices for fine-tuning large language models?",
+        "Explain retrieval augmented generation and how teams use it today.",
+        "How are companies applying generative AI in healthcare?",
+    ],
+}
+
+
+class QueryRouter:
+    """
+    Pick a strategy locally when confident, otherwise defer to the LLM classifier.
+
+    Keyword/regex rules are tried first. Otherwise the query embedding is
+    compared with per-strategy centroids of labelled example queries; the
+    route is accepted when the best similarity reaches `min_similarity` and
+    beats the runner-up by at least `min_margin`.
+
+    Args:
+        memory: Memory whose embedding model is reused (None disables centroids)
+        min_similarity: Minimum cosine similarity to the winning centroid
+        min_margin: Minimum gap between the best and second-best centroid
+    """
+
+    def __init__(self, memory=None, min_similarity: float = None, min_margin: float = None):
+        self.memory = memory
+        self.min_similarity = config.ROUTER_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.min_margin = config.ROUTER_MIN_MARGIN if min_margin is None else min_margin
+        self.rules = [(re.compile(pattern, re.IGNORECASE), strategy) for pattern, strategy in RULES]
+        self._centroids = None
+        self._lock = threading.Lock()
+        self.counters = {"rule": 0, "centroid": 0, "llm": 0, "llm_invalid": 0}
+
+    def _load_centroids(self):
+        import numpy as np
+
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    labels = list(EXAMPLES)
+                    vectors = []
+                    for label in labels:
+                        embeddings = np.asarray(self.memory.embed(EXAMPLES[label]), dtype=np.float32)
+                        centroid = embeddings.mean(axis=0)
+                        vectors.append(centroid / np.linalg.norm(centroid))
+                    self._centroids = (labels, np.stack(vectors))
+        return self._centroids
+
+    def match_rules(self, query: str) -> Optional[str]:
+        for pattern, strategy in self.rules:
+            if pattern.search(query):
+                return strategy
+        return None
+
+    def match_centroid(self, query: str, embedding=None) -> Tuple[Optional[str], float]:
+        """Nearest-centroid strategy and its similarity, or (None, score) when not confident."""
+        import numpy as np
+
+        if self.memory is None:
+            return None, 0.0
+        labels, centroids = self._load_centroids()
+        if embedding is None:
+            embedding = self.memory.embed_queries([query])[0]
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        scores = centroids @ vector
+        order = np.argsort(scores)[::-1]
+        best, second = float(scores[order[0]]), float(scores[order[1]])
+        if best >= self.min_similarity and best - second >= self.min_margin:
+            return labels[order[0]], best
+        return None, best
+
+    def route(self, query: str, embedding=None) -> Tuple[Optional[str], str]:
+        """
+        Route a query without the LLM.
+
+        Returns:
+            (strategy, source) where source is "rule" or "centroid"; strategy is
+            None when the caller should fall back to the LLM classifier
+        """
+        strategy = self.match_rules(query)
+        if strategy:
+            self.counters["rule"] += 1
+            return strategy, "rule"
+        try:
+            strategy, _ = self.match_centroid(query, embedding)
+        except Exception as e:
+            print(f"Router centroid match failed: {e}")
+            strategy = None
+        if strategy:
+            self.counters["centroid"] += 1
+            return strategy, "centroid"
+        return None, "llm"
+
+    def record_llm(self, strategy: str):
+        """Count a decision that needed the LLM classifier."""
+        self.counters["llm"] += 1
+        if strategy not in STRATEGIES:
+            self.counters["llm_invalid"] += 1
+
+    def stats(self) -> dict:
+        total = sum(self.counters[k] for k in ("rule", "centroid", "llm"))
+        return {**self.counters, "total": total,
+                "local_rate": round((self.counters["rule"] + self.counters["centroid"]) / total, 3) if total else 0.0}
@@ -0,0 +1,72 @@
+# Speculative web search started before the manager has picked a strategy
+
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from backend.tools import search_web_many
+
+
+class SpeculativeSearch:
+    """
+    Registry of web searches launched speculatively while the manager plans.
+
+    The manager calls `start` as soon as a request arrives and gets back a
+    token to put in the plan. The research agent `adopt`s the running task
+    when the strategy needs the web; otherwise the manager `discard`s it.
+    Tasks nobody claims within `max_age` seconds are cancelled.
+
+    Args:
+        max_results: Results requested by the speculative search
+        max_age: Seconds before an unclaimed task is dropped
+    """
+
+    def __init__(self, max_results: int = 5, max_age: float = 60):
+        self.max_results = max_results
+        self.max_age = max_age
+        self._tasks: Dict[str, Tuple[asyncio.Task, float]] = {}
+        self.counters = {"started": 0, "adopted": 0, "discarded": 0, "expired": 0}
+
+    def start(self, queries: List[str]) -> str:
+        self._expire()
+        task = asyncio.create_task(
+            asyncio.to_thread(search_web_many, queries, max_results=self.max_results)
+        )
+        token = uuid.uuid4().hex
+        self._tasks[token] = (task, time.monotonic())
+        self.counters["started"] += 1
+        return token
+
+    def adopt(self, token: str) -> Optional[asyncio.Task]:
+        """Take ownership of a speculative search; None if it is unknown or gone."""
+        entry = self._tasks.pop(token, None)
+        if entry is None:
+            return None
+        self.counters["adopted"] += 1
+        return entry[0]
+
+    def discard(self, token: str):
+        entry = self._tasks.pop(token, None)
+        if entry is not None:
+            entry[0].cancel()
+            self.counters["discarded"] += 1
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.max_age
+        for token in [t for t, (_, started) in self._tasks.items() if started < cutoff]:
+            self._tasks.pop(token)[0].cancel()
+            self.counters["expired"] += 1
+
+    def stats(self) -> dict:
+        started = self.counters["started"]
+        wasted = self.counters["discarded"] + self.counters["expired"]
+        return {**self.counters, "in_flight": len(self._tasks),
+                "wasted_rate": round(wasted / started, 3) if started else 0.0}
+
+
+_speculator = SpeculativeSearch()
+
+def get_speculator() -> SpeculativeSearch:
+    """Process-wide speculation registry shared by the manager and research agents."""
+    return _speculator
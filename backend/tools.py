@@ -1,46 +1,177 @@
 # Tools (web, pdf, html, OCR, LLM, chroma)
 
-from ddgs import DDGS
-from groq import Groq
-from typing import List
-import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 from dotenv import load_dotenv
+import contextvars
+import re
+import threading
+import time
+
+from backend import config
+from backend.cache import TTLCache, normalize_query
+from backend.metrics import span
+from backend.llm import acall_llm, acall_llm_stream, run_sync, iter_sync
 
 load_dotenv()
 
-def search_web(query: str, max_results=5):
+_search_cache = TTLCache(maxsize=config.WEB_CACHE_SIZE, ttl=config.WEB_CACHE_TTL)
+_search_pool = ThreadPoolExecutor(max_workers=config.WEB_FANOUT_WORKERS, thread_name_prefix="web-search")
+_sessions = threading.local()
+_search_backend_factory = None  # DDGS, imported on first search
+
+def set_search_backend(factory):
+    """
+    Replace the search backend (e.g. a local stand-in for tests/benchmarks).
+
+    Args:
+        factory: Zero-argument callable returning an object with DDGS's
+            text(query, max_results=...) method
+    """
+    global _search_backend_factory
+    _search_backend_factory = factory
+    _search_cache.clear()
+    _sessions.__dict__.clear()
+
+def _ddgs():
+    # One DDGS session per thread, reused across searches
+    session = getattr(_sessions, "ddgs", None)
+    if session is None:
+        if _search_backend_factory is None:
+            from ddgs import DDGS
+
+            session = DDGS()
+        else:
+            session = _search_backend_factory()
+        _sessions.ddgs = session
+    return session
+
+def search_web_records(query: str, max_results=5) -> List[Dict[str, str]]:
+    """
+    Search the web and return full result records.
+
+    Results are cached by normalized query and max_results for WEB_CACHE_TTL seconds.
+
+    Returns:
+        List of {"url", "title", "body"} dicts
+    """
+    key = (normalize_query(query), max_results)
+    cached = _search_cache.get(key)
+    if cached is not None:
+        return list(cached)
+
     results = []
     try:
-        with DDGS() as ddgs:
-            for r in ddgs.text(query, max_results=max_results):
-                results.append(r.get("body", ""))
+        with span("web_search"):
+            for r in _ddgs().text(query, max_results=max_results):
+                results.append({
+                    "url": r.get("href", ""),
+                    "title": r.get("title", ""),
+                    "body": r.get("body", ""),
+                })
     except Exception as e:
         print(f"Error while searching web: {e}")
-    return results
+        _sessions.ddgs = None
+    if results:
+        _search_cache.set(key, results)
+    return list(results)
+
+def _fingerprint(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+def dedupe_records(records: List[Dict[str, str]], threshold: float = None) -> List[Dict[str, str]]:
+    """
+    Drop records with a repeated URL or a body that near-duplicates an earlier one.
+
+    Args:
+        records: Search result records, in priority order
+        threshold: Token Jaccard similarity above which bodies count as duplicates
+    """
+    threshold = config.WEB_DEDUPE_THRESHOLD if threshold is None else threshold
+    seen_urls = set()
+    kept, fingerprints = [], []
+    for record in records:
+        url = record.get("url", "").rstrip("/")
+        if url and url in seen_urls:
+            continue
+        words = _fingerprint(record.get("body", ""))
+        if not words:
+            continue
+        if any(len(words & other) / len(words | other) >= threshold for other in fingerprints):
+            continue
+        if url:
+            seen_urls.add(url)
+        fingerprints.append(words)
+        kept.append(record)
+    return kept
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "what", "which", "who",
+    "whom", "how", "why", "when", "where", "can", "could", "would", "should", "you", "me", "i", "my",
+    "of", "to", "in", "on", "for", "about", "and", "or", "tell", "explain", "please", "there", "it",
+}
+_RECENCY = re.compile(r"\b(latest|current|currently|today|recent|recently|news|now)\b")
+
+def reformulate_query(query: str, limit: int = None) -> List[str]:
+    """
+    Cheap local search reformulations of a query (no LLM call).
+
+    A keyword form without question words and stopwords matches pages that
+    don't phrase things as the question does; queries asking for recent
+    information also get a variant pinned to the current year.
+
+    Args:
+        query: User query
+        limit: Maximum variants (default WEB_REFORMULATIONS)
+
+    Returns:
+        Up to `limit` variants, none equal to the normalized query
+    """
+    limit = config.WEB_REFORMULATIONS if limit is None else limit
+    if limit <= 0:
+        return []
+    normalized = normalize_query(query)
+    words = re.findall(r"[\w.+#-]+", normalized)
+    keywords = " ".join(w for w in words if w not in _STOPWORDS)
+    variants = []
+    if keywords and keywords != normalized and len(keywords.split()) >= 2:
+        variants.append(keywords)
+    if _RECENCY.search(normalized):
+        year = str(time.localtime().tm_year)
+        if year not in normalized:
+            variants.append(f"{keywords or normalized} {year}")
+    return variants[:limit]
+
+def search_web_many(queries: List[str], max_results=5) -> List[Dict[str, str]]:
+    """
+    Run several query reformulations concurrently and merge their results.
+
+    Results are interleaved round-robin across queries, then URL/near-duplicate deduplicated.
+    """
+    queries = list(dict.fromkeys(q for q in queries if q and q.strip()))
+    if len(queries) == 1:
+        return dedupe_records(search_web_records(queries[0], max_results))
+    # Each call runs in a copy of the caller's context so its web_search span lands in the request's trace
+    futures = [_search_pool.submit(contextvars.copy_context().run, search_web_records, q, max_results)
+               for q in queries]
+    per_query = [future.result() for future in futures]
+
+    merged = []
+    for i in range(max((len(r) for r in per_query), default=0)):
+        for results in per_query:
+            if i < len(results):
+                merged.append(results[i])
+    return dedupe_records(merged)
+
+def search_web(query: str, max_results=5):
+    return [r["body"] for r in search_web_records(query, max_results=max_results) if r["body"]]
 
 def call_llm(prompt: str):
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0.3
-    )
-    return response.choices[0].message.content
+    # Sync wrapper over the pooled async client in backend/llm.py
+    return run_sync(acall_llm(prompt, max_tokens=150, temperature=0.3))
 
 def call_llm_stream(prompt: str):
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-    stream = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[{"role": "user", "content": prompt}],
-        stream=True,  # ✅ enable streaming
-    )
-
-    for chunk in stream:
-        if chunk.choices[0].delta.content:
-            yield chunk.choices[0].delta.content
+    yield from iter_sync(acall_llm_stream(prompt))
 
 # if __name__ == "__main__":
 #     print(search_web("What is LangGraph?"))
@@ -0,0 +1,500 @@
+# Vector store backends behind Memory: ChromaDB or an in-process NumPy index
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: no cross-process locking, so only one process may write
+    fcntl = None
+
+import numpy as np
+
+from backend import config
+
+INCLUDE_ALL = ("documents", "metadatas")
+
+
+class VectorStore:
+    """
+    Storage interface used by Memory.
+
+    Mirrors the subset of the Chroma collection API that Memory relies on, so
+    results come back in the same shape: `get` returns flat lists, `query`
+    returns one list per query embedding.
+    """
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def get(self, ids: List[str] = None, include=INCLUDE_ALL, where: dict = None) -> dict:
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict] = None):
+        raise NotImplementedError
+
+    def update(self, ids: List[str], metadatas: List[dict]):
+        """Merge `metadatas` into the stored metadata of existing `ids` (unknown IDs are ignored)."""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results: int = 10, include=INCLUDE_ALL, where: dict = None) -> dict:
+        """`where` uses Chroma's metadata filter syntax ({"key": value}, $gte/$lt/$in/..., $and/$or)."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class ChromaStore(VectorStore):
+    """A persistent Chroma collection."""
+
+    def __init__(self, path: str, name: str):
+        import chromadb
+
+        self.name = name
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name)
+
+    def count(self):
+        return self.collection.count()
+
+    def get(self, ids=None, include=INCLUDE_ALL, where=None):
+        return self.collection.get(ids=ids, include=list(include), where=where or None)
+
+    def upsert(self, ids, embeddings, documents, metadatas=None):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def query(self, query_embeddings, n_results=10, include=INCLUDE_ALL, where=None):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results,
+                                     include=list(include), where=where or None)
+
+    def clear(self):
+        self.client.delete_collection(self.name)
+        self.collection = self.client.get_or_create_collection(self.name)
+
+
+class NumpyStore(VectorStore):
+    """
+    Brute-force cosine index over a memory-mapped matrix of normalized embeddings.
+
+    On-disk layout under `<path>/<name>/` is append-only:
+      - header.json: dimension and storage dtype
+      - vectors.bin: raw rows (float32, float16, or int8 with a per-row float32 scale)
+      - records.jsonl: one line per add/update/delete with the row's ID,
+        document and metadata; replayed on open
+
+    Deleted and replaced rows stay in vectors.bin (masked out) until dead rows
+    outnumber live ones, at which point both files are rewritten.
+
+    Several processes (server workers, the ingest CLI) may share an index:
+    writes hold an exclusive flock on `lock` and first replay whatever other
+    processes appended since this one last read records.jsonl, so row numbers
+    always match the real end of vectors.bin; reads replay new records when
+    the log has changed.
+
+    Args:
+        path: Directory holding the index
+        name: Index name (subdirectory)
+        dtype: "float32", "float16" or "int8"
+        block_rows: Rows scored per block during search (smaller blocks keep
+            the float32 copy of float16/int8 rows in cache)
+    """
+
+    DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+    def __init__(self, path: str, name: str, dtype: str = None, block_rows: int = None):
+        self.dir = os.path.join(path, name)
+        os.makedirs(self.dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._header_path = os.path.join(self.dir, "header.json")
+        self._vectors_path = os.path.join(self.dir, "vectors.bin")
+        self._records_path = os.path.join(self.dir, "records.jsonl")
+        self._lock_path = os.path.join(self.dir, "lock")
+        self._records_state = (None, 0)  # (inode, bytes) of records.jsonl replayed so far
+
+        header = self._read_header()
+        self.dtype_name = header["dtype"] if header else dtype or config.NUMPY_INDEX_DTYPE
+        if self.dtype_name not in self.DTYPES:
+            raise ValueError(f"Unsupported index dtype: {self.dtype_name}")
+        self.dtype = np.dtype(self.DTYPES[self.dtype_name])
+        self.block_rows = block_rows or (65536 if self.dtype_name == "float32" else 2048)
+        with self._file_lock():
+            self._load()
+
+    def _read_header(self) -> Optional[dict]:
+        try:
+            with open(self._header_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        """Hold the index's lock file, shared by every process using this directory."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _row_dtype(self) -> np.dtype:
+        """On-disk dtype of one row; int8 rows carry their own dequantization scale."""
+        if self.dtype_name == "int8":
+            return np.dtype([("q", np.int8, (self.dim,)), ("scale", np.float32)])
+        return np.dtype((self.dtype, (self.dim,)))
+
+    def _rows_on_disk(self) -> int:
+        if self.dim and os.path.exists(self._vectors_path):
+            return os.path.getsize(self._vectors_path) // self._row_dtype().itemsize
+        return 0
+
+    def _load(self):
+        """Rebuild the in-memory state from both files (caller holds the file lock)."""
+        self._row_ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[dict]] = []
+        self._rows: Dict[str, int] = {}
+        header = self._read_header()
+        self.dim = header["dim"] if header else None
+        rows_on_disk = self._rows_on_disk()
+
+        self._records_state = (None, 0)
+        if os.path.exists(self._records_path):
+            records, offset = self._read_records(0)
+            for record in records:
+                self._replay(record, rows_on_disk)
+            self._records_state = (os.stat(self._records_path).st_ino, offset)
+
+        # Vectors appended without their record (interrupted write) are dropped
+        rows = len(self._row_ids)
+        if rows_on_disk > rows:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(rows * self._row_dtype().itemsize)
+        self._alive = np.array([doc_id is not None for doc_id in self._row_ids], dtype=bool)
+        self._matrix = None
+
+    def _read_records(self, offset: int):
+        """Complete records after byte `offset` of the log, and the offset after the last one."""
+        records = []
+        with open(self._records_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final line from an interrupted write
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                offset += len(line)
+        return records, offset
+
+    def _log_changed(self) -> bool:
+        inode, offset = self._records_state
+        try:
+            stat = os.stat(self._records_path)
+        except FileNotFoundError:
+            return inode is not None
+        return stat.st_ino != inode or stat.st_size != offset
+
+    def _sync(self):
+        """Replay records other processes appended since the last read (caller holds the file lock)."""
+        inode, offset = self._records_state
+        try:
+            stat = os.stat(self._records_path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None and inode is None or stat is not None and (stat.st_ino, stat.st_size) == (inode, offset):
+            return
+        if stat is None or stat.st_ino != inode or stat.st_size < offset:
+            # Rewritten (vacuum) or removed (clear) by another process
+            self._load()
+            return
+        if self.dim is None:
+            header = self._read_header()
+            self.dim = header["dim"] if header else None
+        records, offset = self._read_records(offset)
+        rows_on_disk = self._rows_on_disk()
+        for record in records:
+            self._replay(record, rows_on_disk)
+        self._records_state = (inode, offset)
+        self._alive = np.array([doc_id is not None for doc_id in self._row_ids], dtype=bool)
+
+    def _refresh(self):
+        """Pick up other processes' writes before a read; a stat when nothing changed."""
+        if self._log_changed():
+            with self._file_lock(exclusive=False):
+                self._sync()
+
+    def _replay(self, record: dict, rows_on_disk: int):
+        op = record["op"]
+        if op == "add":
+            if record["row"] >= rows_on_disk or record["row"] != len(self._row_ids):
+                return
+            self._drop(record["id"])
+            self._rows[record["id"]] = record["row"]
+            self._row_ids.append(record["id"])
+            self._documents.append(record.get("document"))
+            self._metadatas.append(record.get("metadata"))
+        elif op == "update" and record["id"] in self._rows:
+            row = self._rows[record["id"]]
+            self._metadatas[row] = {**(self._metadatas[row] or {}), **record["metadata"]}
+        elif op == "delete":
+            self._drop(record["id"])
+
+    def _drop(self, doc_id: str):
+        row = self._rows.pop(doc_id, None)
+        if row is not None:
+            self._row_ids[row] = None
+            self._documents[row] = None
+            self._metadatas[row] = None
+
+    def _append_records(self, records: List[dict]):
+        with open(self._records_path, "ab") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records).encode())
+            f.flush()
+            os.fsync(f.fileno())
+            # Under the file lock and synced, so the log holds nothing we haven't replayed
+            self._records_state = (os.fstat(f.fileno()).st_ino, f.tell())
+
+    def _matrix_view(self) -> np.ndarray:
+        """Read-only memmap over every row written so far (live or dead)."""
+        if self._matrix is None or len(self._matrix) != len(self._row_ids):
+            if not self._row_ids:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            # Viewed with the row dtype: float rows come back as (n, dim), int8 rows as records
+            self._matrix = np.memmap(self._vectors_path, dtype=self._row_dtype(), mode="r",
+                                     shape=(len(self._row_ids),))
+        return self._matrix
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dtype_name == "int8":
+            scale = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            rows = np.empty(len(vectors), dtype=self._row_dtype())
+            rows["q"] = np.rint(vectors / scale[:, None])
+            rows["scale"] = scale
+            return rows
+        return vectors.astype(self.dtype)
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        if len(rows) == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self.dtype_name == "int8":
+            return rows["q"].astype(np.float32) * rows["scale"][:, None]
+        return np.asarray(rows, dtype=np.float32)
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def get(self, ids=None, include=INCLUDE_ALL, where=None):
+        with self._lock:
+            self._refresh()
+            if ids is None:
+                rows = [row for row, doc_id in enumerate(self._row_ids) if doc_id is not None]
+            else:
+                rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+            if where:
+                rows = [row for row in rows if matches(self._metadatas[row], where)]
+            result = {"ids": [self._row_ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                matrix = self._matrix_view()
+                result["embeddings"] = self._decode(matrix[rows]) if rows else []
+        return result
+
+    def upsert(self, ids, embeddings, documents, metadatas=None):
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._header_path, "w") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype_name}, f)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index ({self.dim})")
+
+            # Vectors first, then records: a crash in between leaves rows that are cut off here or by _load()
+            start = len(self._row_ids)
+            if self._rows_on_disk() > start:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(start * self._row_dtype().itemsize)
+            with open(self._vectors_path, "ab") as f:
+                f.write(self._encode(vectors).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            records = [{"op": "add", "row": start + n, "id": doc_id, "document": document, "metadata": meta}
+                       for n, (doc_id, document, meta) in enumerate(zip(ids, documents, metadatas))]
+            self._append_records(records)
+            replaced = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+            for record in records:
+                self._replay(record, start + len(records))
+            # Rows of replaced IDs (including repeats within this batch) are masked out
+            alive = np.concatenate([self._alive, np.ones(len(records), dtype=bool)])
+            alive[replaced] = False
+            alive[start:] = [doc_id is not None for doc_id in self._row_ids[start:]]
+            self._alive = alive
+            self._maybe_vacuum()
+
+    def update(self, ids, metadatas):
+        with self._lock, self._file_lock():
+            self._sync()
+            records = [{"op": "update", "id": doc_id, "metadata": meta}
+                       for doc_id, meta in zip(ids, metadatas) if doc_id in self._rows and meta]
+            if records:
+                self._append_records(records)
+                for record in records:
+                    self._replay(record, len(self._row_ids))
+
+    def delete(self, ids):
+        with self._lock, self._file_lock():
+            self._sync()
+            records = [{"op": "delete", "id": doc_id} for doc_id in dict.fromkeys(ids) if doc_id in self._rows]
+            if not records:
+                return
+            self._append_records(records)
+            alive = self._alive.copy()
+            for record in records:
+                alive[self._rows[record["id"]]] = False
+                self._drop(record["id"])
+            self._alive = alive
+            self._maybe_vacuum()
+
+    def query(self, query_embeddings, n_results=10, include=INCLUDE_ALL, where=None):
+        queries = self._normalize(query_embeddings)
+        with self._lock:
+            self._refresh()
+            matrix, alive = self._matrix_view(), self._alive
+            row_ids, documents, metadatas = self._row_ids, self._documents, self._metadatas
+            if where:
+                alive = alive & np.array([meta is not None and matches(meta, where) for meta in metadatas],
+                                         dtype=bool)
+        k = min(n_results, int(alive.sum()))
+        result = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        if k == 0:
+            for key in result:
+                result[key] = [[] for _ in queries]
+            return result
+
+        scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), self.block_rows):
+            block = self._decode(matrix[start:start + self.block_rows])
+            scores[:, start:start + len(block)] = queries @ block.T
+        scores[:, ~alive] = -np.inf
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for n, candidates in enumerate(top):
+            rows = candidates[np.argsort(-scores[n, candidates])]
+            result["ids"].append([row_ids[row] for row in rows])
+            result["distances"].append([float(1 - scores[n, row]) for row in rows])
+            result["documents"].append([documents[row] for row in rows])
+            result["metadatas"].append([metadatas[row] for row in rows])
+        return {key: value for key, value in result.items() if key == "ids" or key in include}
+
+    def _maybe_vacuum(self):
+        dead = len(self._row_ids) - len(self._rows)
+        if dead > 1024 and dead > len(self._rows):
+            self._vacuum()
+
+    def _vacuum(self):
+        """Rewrite both files with live rows only."""
+        rows = [row for row, doc_id in enumerate(self._row_ids) if doc_id is not None]
+        matrix = self._matrix_view()
+        tmp_vectors, tmp_records = self._vectors_path + ".tmp", self._records_path + ".tmp"
+        with open(tmp_vectors, "wb") as f:
+            for start in range(0, len(rows), self.block_rows):
+                f.write(np.ascontiguousarray(matrix[rows[start:start + self.block_rows]]).tobytes())
+        with open(tmp_records, "w") as f:
+            for n, row in enumerate(rows):
+                f.write(json.dumps({"op": "add", "row": n, "id": self._row_ids[row],
+                                    "document": self._documents[row], "metadata": self._metadatas[row]}) + "\n")
+        self._matrix = None
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_records, self._records_path)
+        self._load()
+
+    def clear(self):
+        with self._lock, self._file_lock():
+            for file_path in (self._vectors_path, self._records_path, self._header_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self._load()
+
+
+_OPERATORS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+
+def matches(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma-style `where` filter against one metadata dict."""
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_OPERATORS[op](value, operand) for op, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def open_store(backend: str = None, path: str = None, name: str = None) -> VectorStore:
+    """
+    Open the configured vector store.
+
+    Args:
+        backend: "chroma" or "numpy" (default MEMORY_BACKEND)
+        path: Storage directory (default CHROMA_PATH)
+        name: Collection / index name (default COLLECTION_NAME)
+    """
+    backend = (backend or config.MEMORY_BACKEND).strip().lower()
+    path = path or config.CHROMA_PATH
+    name = name or config.COLLECTION_NAME
+    if backend == "chroma":
+        return ChromaStore(path, name)
+    if backend == "numpy":
+        return NumpyStore(path, name)
+    raise ValueError(f"Unknown memory backend: {backend}")
@@ -0,0 +1 @@
+# Offline benchmarks (python -m bench.run)
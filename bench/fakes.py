@@ -0,0 +1,161 @@
+# Local stand-ins for Groq, DDGS and the embedding model used by the benchmarks
+
+import asyncio
+import hashlib
+import json
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+class FakeGroqServer:
+    """
+    OpenAI/Groq-compatible chat completions server on a local port.
+
+    Point GROQ_BASE_URL at `base_url` so the real AsyncGroq client (and its
+    connection pool) is exercised. Responses are canned per prompt type.
+
+    Args:
+        latency: Seconds before the first byte of every response
+        tokens_per_sec: Streaming rate; also used to delay non-streamed bodies
+        answer_tokens: Tokens in a generated answer
+    """
+
+    def __init__(self, latency: float = 0.3, tokens_per_sec: float = 200, answer_tokens: int = 60):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.requests = 0
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._server = None
+        self._thread = None
+
+    def reply(self, prompt: str) -> List[str]:
+        """Token list the fake model returns for a prompt."""
+        if "Classify the user query" in prompt:
+            return ["web_research"]
+        if "ANSWER:" in prompt:
+            facts = ["FACTS:\n"] + [f"- Fact {i} about the topic.\n" for i in range(1, 4)]
+            return facts + ["ANSWER: "] + [f"word{i} " for i in range(self.answer_tokens)]
+        if "Validate the following information" in prompt:
+            return [f"- Fact {i} about the topic.\n" for i in range(1, 4)]
+        return [f"word{i} " for i in range(self.answer_tokens)]
+
+    def app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/openai/v1/chat/completions")
+        async def completions(request: Request):
+            body = await request.json()
+            self.requests += 1
+            prompt = body["messages"][-1]["content"]
+            tokens = self.reply(prompt)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(tokens),
+                     "total_tokens": len(prompt) // 4 + len(tokens)}
+            await asyncio.sleep(self.latency)
+
+            if not body.get("stream"):
+                await asyncio.sleep(len(tokens) / self.tokens_per_sec)
+                return {
+                    "id": completion_id, "object": "chat.completion", "created": created,
+                    "model": body["model"], "usage": usage,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(tokens)}}],
+                }
+
+            async def events():
+                for token in tokens:
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                             "model": body["model"],
+                             "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(1 / self.tokens_per_sec)
+                final = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": body["model"], "x_groq": {"usage": usage},
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return app
+
+    def start(self):
+        import uvicorn
+
+        config = uvicorn.Config(self.app(), host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake Groq server did not start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+
+class FakeDDGS:
+    """
+    DDGS stand-in with configurable latency, for backend.tools.set_search_backend.
+
+    Args:
+        latency: Seconds each text search takes
+    """
+
+    def __init__(self, latency: float = 0.5):
+        self.latency = latency
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+        time.sleep(self.latency)
+        slug = hashlib.md5(query.encode()).hexdigest()[:8]
+        return [
+            {"href": f"https://example.com/{slug}/{i}", "title": f"{query} ({i})",
+             "body": f"Result {i} for {query}: background details, figures and context number {i}."}
+            for i in range(max_results)
+        ]
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder with the SentenceTransformer encode API.
+
+    Used with --fake-embeddings when the MiniLM weights are not available offline.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        if isinstance(texts, str):
+            return self._one(texts)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._one(t) for t in texts])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
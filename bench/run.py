@@ -0,0 +1,331 @@
+# End-to-end benchmark: drives /chat and /chat/stream against local Groq/DDGS stand-ins
+#
+#   python -m bench.run --requests 200 --concurrency 16 --output bench_results.json
+#   python -m bench.run --compare bench_results.json      # regression check vs. a previous run
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+QUERIES = [
+    "hello, can you help me?",
+    "what is 12 * 7?",
+    "define entropy",
+    "latest news on AI chips",
+    "what is the current price of bitcoin",
+    "according to the report what are the challenges of generative AI",
+    "what does the document say about GANs",
+    "what is langgraph",
+    "how do vector databases work",
+    "explain retrieval augmented generation",
+    "compare transformers and RNNs",
+    "what are diffusion models",
+]
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    array = np.asarray(values)
+    return {
+        "p50": round(float(np.percentile(array, 50)), 4),
+        "p95": round(float(np.percentile(array, 95)), 4),
+        "p99": round(float(np.percentile(array, 99)), 4),
+        "mean": round(float(array.mean()), 4),
+    }
+
+
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import backend.main as backend_main
+imported = time.perf_counter()
+heavy = [name for name in {heavy} if name in sys.modules]
+from bench.vector_index import rss_mb
+rss_import = rss_mb()
+memory = backend_main.shared_memory
+if memory is not None:
+    if {fake_embeddings}:
+        from bench.fakes import HashingEmbedder
+        memory._model = HashingEmbedder()
+    memory.warm_up()
+print(json.dumps({{
+    "import_seconds": round(imported - started, 3),
+    "ready_seconds": round(time.perf_counter() - started, 3),
+    "rss_after_import_mb": round(rss_import, 1),
+    "rss_after_warmup_mb": round(rss_mb(), 1),
+    "heavy_modules_at_import": heavy,
+}}))
+"""
+
+
+def startup_report(env: dict, fake_embeddings: bool) -> dict:
+    """Cold-start cost of one worker: import time, time to ready and RSS, measured in a fresh interpreter."""
+    # Which heavy modules importing the app pulls in is checked before warm-up loads them
+    heavy = ["chromadb", "sentence_transformers", "torch", "groq", "ddgs", "onnxruntime"]
+    probe = STARTUP_PROBE.format(fake_embeddings=fake_embeddings, heavy=repr(heavy))
+    result = subprocess.run([sys.executable, "-c", probe], env=env, capture_output=True, text=True, timeout=600)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def reset_state(backend_main, search_backend):
+    """Drop answers, memory and search caches left behind by the previous endpoint's run."""
+    from backend import tools
+
+    backend_main.answer_cache.clear()
+    tools.set_search_backend(search_backend)  # also clears the web search cache
+    memory = backend_main.shared_memory
+    if memory is not None:
+        memory.flush()
+        memory.clear()
+        memory.embedding_cache.clear()
+
+
+def start_app(app) -> str:
+    """Serve the FastAPI app with uvicorn in a background thread; returns its base URL."""
+    import uvicorn
+    from bench.fakes import _free_port
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Backend did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_chat(client, query: str) -> dict:
+    started = time.perf_counter()
+    response = await client.get("/chat", params={"query": query})
+    elapsed = time.perf_counter() - started
+    record = {"endpoint": "chat", "latency": elapsed, "status": response.status_code, "ttft": None, "nodes": {}}
+    if response.status_code == 200:
+        body = response.json()
+        record["strategy"] = body.get("plan", {}).get("strategy", "unknown")
+        record["cached"] = bool(body.get("plan", {}).get("cached"))
+        record["nodes"] = body.get("timings", {}) or {}
+        if record["cached"]:
+            record["strategy"] = "cached"
+    return record
+
+
+async def run_stream(client, query: str) -> dict:
+    started = time.perf_counter()
+    record = {"endpoint": "stream", "ttft": None, "nodes": {}, "strategy": "unknown", "cached": False}
+    running = {}
+    async with client.stream("GET", "/chat/stream", params={"query": query}) as response:
+        record["status"] = response.status_code
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            now = time.perf_counter() - started
+            kind = event.get("type")
+            if kind == "agent":
+                agent = event.get("agent")
+                if event.get("status") == "running":
+                    running[agent] = now
+                elif event.get("status") == "complete":
+                    if agent in running:
+                        record["nodes"][agent] = now - running.pop(agent)
+                    message = event.get("message", "")
+                    if agent == "Manager":
+                        if message.startswith("Strategy: "):
+                            record["strategy"] = message[len("Strategy: "):]
+                        elif message == "Cached answer":
+                            record["cached"] = True
+            elif kind == "summary_chunk" and record["ttft"] is None:
+                record["ttft"] = now
+            elif kind == "complete":
+                record["nodes"].update(event.get("timings", {}) or {})
+    record["latency"] = time.perf_counter() - started
+    if record["cached"]:
+        record["strategy"] = "cached"
+    return record
+
+
+async def drive(base_url: str, endpoint: str, queries: List[str], concurrency: int) -> dict:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def one(query):
+            async with semaphore:
+                try:
+                    if endpoint == "chat":
+                        return await run_chat(client, query)
+                    return await run_stream(client, query)
+                except Exception as e:
+                    return {"endpoint": endpoint, "status": "error", "error": str(e)}
+
+        started = time.perf_counter()
+        records = await asyncio.gather(*(one(q) for q in queries))
+        wall = time.perf_counter() - started
+    return {"records": records, "wall": wall}
+
+
+def summarize(records: List[dict], wall: float) -> dict:
+    ok = [r for r in records if r.get("status") == 200]
+    by_strategy = defaultdict(list)
+    for record in ok:
+        by_strategy[record.get("strategy", "unknown")].append(record)
+
+    def block(items):
+        nodes = defaultdict(list)
+        for item in items:
+            for node, seconds in item["nodes"].items():
+                nodes[node].append(seconds)
+        return {
+            "count": len(items),
+            "latency": percentiles([i["latency"] for i in items]),
+            "ttft": percentiles([i["ttft"] for i in items if i.get("ttft") is not None]),
+            "nodes": {node: percentiles(values) for node, values in sorted(nodes.items())},
+        }
+
+    return {
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "wall_seconds": round(wall, 3),
+        "requests_per_sec": round(len(ok) / wall, 2) if wall else 0.0,
+        "overall": block(ok),
+        "strategies": {name: block(items) for name, items in sorted(by_strategy.items())},
+    }
+
+
+def print_report(results: dict):
+    startup = results.get("startup") or {}
+    if "import_seconds" in startup:
+        print(f"\nstartup: import {startup['import_seconds']:.2f}s, ready {startup['ready_seconds']:.2f}s, "
+              f"RSS {startup['rss_after_import_mb']:.0f}MB after import / "
+              f"{startup['rss_after_warmup_mb']:.0f}MB after warm-up; heavy modules at import: "
+              f"{', '.join(startup['heavy_modules_at_import']) or 'none'}")
+    elif startup:
+        print(f"\nstartup: {startup['error']}")
+    for endpoint, summary in results["endpoints"].items():
+        print(f"\n/{'chat' if endpoint == 'chat' else 'chat/stream'}: {summary['requests']} requests, "
+              f"{summary['errors']} errors, {summary['requests_per_sec']} req/s")
+        print(f"  {'strategy':<18}{'n':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'ttft p50':>10}")
+        rows = [("ALL", summary["overall"])] + list(summary["strategies"].items())
+        for name, block in rows:
+            lat, ttft = block["latency"], block["ttft"]
+            fmt = lambda v: f"{v:.3f}" if v is not None else "-"
+            print(f"  {name:<18}{block['count']:>5}{fmt(lat['p50']):>9}{fmt(lat['p95']):>9}"
+                  f"{fmt(lat['p99']):>9}{fmt(ttft['p50']):>10}")
+        nodes = summary["overall"]["nodes"]
+        if nodes:
+            print("  node p50: " + ", ".join(f"{n}={v['p50']:.3f}s" for n, v in nodes.items()))
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison with {baseline_path}:")
+    for endpoint, summary in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            old, new = before["overall"]["latency"][metric], summary["overall"]["latency"][metric]
+            if old and new:
+                print(f"  {endpoint:<7}latency {metric}: {old:.3f}s -> {new:.3f}s ({(new - old) / old:+.1%})")
+        old, new = before["requests_per_sec"], summary["requests_per_sec"]
+        if old:
+            print(f"  {endpoint:<7}throughput: {old} -> {new} req/s ({(new - old) / old:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for the research assistant API.")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint", choices=["chat", "stream", "both"], default="both")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake Groq time to first byte (s)")
+    parser.add_argument("--token-rate", type=float, default=200, help="Fake Groq tokens per second")
+    parser.add_argument("--search-latency", type=float, default=0.5, help="Fake DDGS latency (s)")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use a hashing embedder instead of all-MiniLM-L6-v2")
+    parser.add_argument("--unique", action="store_true",
+                        help="Make every query unique so answer/search caches never hit")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="Keep the semantic answer cache on (off by default so the pipeline is measured)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Backend config override, e.g. --set PIPELINE_MODE=single_pass")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    from bench.fakes import FakeDDGS, FakeGroqServer, HashingEmbedder
+
+    groq_server = FakeGroqServer(latency=args.llm_latency, tokens_per_sec=args.token_rate).start()
+
+    # Backend config is read at import time, so everything is set before importing it
+    os.environ["CHROMA_PATH"] = tempfile.mkdtemp(prefix="bench-chroma-")
+    os.environ["GROQ_BASE_URL"] = groq_server.base_url
+    os.environ["GROQ_API_KEY"] = "bench"
+    os.environ["WARMUP_ON_STARTUP"] = "0"
+    os.environ["ANSWER_CACHE_ENABLED"] = "1" if args.answer_cache else "0"
+    for override in args.set:
+        key, _, value = override.partition("=")
+        os.environ[key] = value
+    startup = startup_report(dict(os.environ), args.fake_embeddings)
+
+    from backend import tools
+    import backend.main as backend_main
+
+    search_backend = lambda: FakeDDGS(latency=args.search_latency)
+    tools.set_search_backend(search_backend)
+    if args.fake_embeddings and backend_main.shared_memory is not None:
+        backend_main.shared_memory._model = HashingEmbedder()
+    if backend_main.shared_memory is not None:
+        backend_main.shared_memory.warm_up()
+
+    base_url = start_app(backend_main.app)
+
+    random.seed(args.seed)
+    queries = [random.choice(QUERIES) for _ in range(args.requests)]
+    if args.unique:
+        queries = [f"{q} (#{i})" for i, q in enumerate(queries)]
+
+    endpoints = ["chat", "stream"] if args.endpoint == "both" else [args.endpoint]
+    results = {
+        "config": {**{k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+                   "python": sys.version.split()[0], "platform": platform.platform()},
+        "startup": startup,
+        "endpoints": {},
+    }
+    for n, endpoint in enumerate(endpoints):
+        if n:
+            # Each endpoint starts from the same cold state, so it measures the pipeline, not the previous run's caches
+            reset_state(backend_main, search_backend)
+        run = asyncio.run(drive(base_url, endpoint, queries, args.concurrency))
+        results["endpoints"][endpoint] = summarize(run["records"], run["wall"])
+    results["fake_groq_requests"] = groq_server.requests
+    groq_server.stop()
+
+    print_report(results)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
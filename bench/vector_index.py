@@ -0,0 +1,167 @@
+# Vector store benchmark: Chroma vs. the NumPy index (recall@k, query latency, RSS)
+#
+#   python -m bench.vector_index --sizes 10000 100000 --output bench_index.json
+#   python -m bench.vector_index --sizes 1000000 --backends numpy-float16 numpy-int8
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+BACKENDS = ["chroma", "numpy-float32", "numpy-float16", "numpy-int8"]
+
+
+def make_dataset(path: str, size: int, dim: int, queries: int, seed: int) -> np.ndarray:
+    """
+    Write `size` clustered unit vectors to `path` (.npy) and return query vectors.
+
+    Clusters make the neighbour structure closer to real sentence embeddings
+    than uniform noise, where every point is about equally far from every other.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(16, size // 500), dim)).astype(np.float32)
+
+    def sample(n):
+        points = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(size, dim))
+    for start in range(0, size, 50000):
+        data[start:start + 50000] = sample(min(50000, size - start))
+    data.flush()
+    return sample(queries)
+
+
+def exact_topk(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Ground-truth neighbours by brute force in float32."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(data), 100000):
+        block = np.asarray(data[start:start + 100000])
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        rows = np.concatenate([best_rows, np.arange(start, start + len(block))[None, :].repeat(len(queries), 0)], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_rows = np.take_along_axis(rows, top, axis=1)
+    return best_rows
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_backend(name: str, path: str):
+    from backend.vector_store import ChromaStore, NumpyStore
+
+    if name == "chroma":
+        return ChromaStore(path, "bench")
+    return NumpyStore(path, "bench", dtype=name.split("-", 1)[1])
+
+
+def build(name: str, path: str, data_path: str, batch: int) -> dict:
+    """Insert the dataset into a fresh store (runs in its own process)."""
+    data = np.load(data_path, mmap_mode="r")
+    store = open_backend(name, path)
+    started = time.perf_counter()
+    for start in range(0, len(data), batch):
+        rows = np.asarray(data[start:start + batch])
+        ids = [f"v{i}" for i in range(start, start + len(rows))]
+        store.upsert(ids, rows.tolist() if name == "chroma" else rows, [f"doc {i}" for i in ids])
+    return {"build_seconds": round(time.perf_counter() - started, 3)}
+
+
+def serve(name: str, path: str, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    """Open the built store cold, then time single-query searches (runs in its own process)."""
+    baseline = rss_mb()
+    started = time.perf_counter()
+    store = open_backend(name, path)
+    store.count()
+    open_seconds = time.perf_counter() - started
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = store.query([query.tolist()], n_results=k, include=())
+        latencies.append(time.perf_counter() - started)
+        found = {int(doc_id[1:]) for doc_id in result["ids"][0]}
+        recalls.append(len(found & set(expected.tolist())) / k)
+    return {
+        "open_seconds": round(open_seconds, 3),
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - baseline, 1),
+        "disk_mb": round(sum(os.path.getsize(os.path.join(root, f))
+                             for root, _, files in os.walk(path) for f in files) / 2 ** 20, 1),
+    }
+
+
+def isolated(func, *args):
+    """Run `func` in a fresh interpreter so RSS numbers don't bleed between backends."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def run(sizes: List[int], backends: List[str], dim: int, queries: int, k: int, batch: int, seed: int) -> dict:
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench-index-")
+    try:
+        for size in sizes:
+            data_path = os.path.join(workdir, f"data-{size}.npy")
+            query_vectors = make_dataset(data_path, size, dim, queries, seed)
+            truth = exact_topk(np.load(data_path, mmap_mode="r"), query_vectors, k)
+            results[str(size)] = {}
+            for name in backends:
+                path = os.path.join(workdir, f"{name}-{size}")
+                print(f"{size:>9} vectors  {name:<14}", end="", flush=True)
+                stats = isolated(build, name, path, data_path, batch)
+                stats.update(isolated(serve, name, path, query_vectors, truth, k))
+                results[str(size)][name] = stats
+                print(f"recall@{k}={stats[f'recall@{k}']:.3f}  p50={stats['latency_p50_ms']:.2f}ms  "
+                      f"p95={stats['latency_p95_ms']:.2f}ms  rss={stats['rss_mb']:.0f}MB  "
+                      f"disk={stats['disk_mb']:.0f}MB  build={stats['build_seconds']:.1f}s")
+                shutil.rmtree(path, ignore_errors=True)
+            os.remove(data_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the Chroma and NumPy memory backends.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=5000, help="Vectors per upsert while building")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.backends, args.dim, args.queries, args.k, args.batch, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
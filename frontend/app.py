@@ -1,6 +1,21 @@
 import streamlit as st
 import requests
 import json
+import time
+
+STREAM_URL = "http://127.0.0.1:8000/chat/stream"
+MAX_RECONNECTS = 5
+
+
+def get_session():
+    """
+    This browser session's pooled HTTP session, so reconnects reuse connections.
+    Kept in st.session_state rather than shared across users: requests.Session
+    is not thread-safe and each Streamlit session runs on its own thread.
+    """
+    if "http_session" not in st.session_state:
+        st.session_state.http_session = requests.Session()
+    return st.session_state.http_session
 
 st.title("🤖 Multi-Agent Research Assistant")
 st.markdown("*Ask a question and watch the agents work in real-time!*")
@@ -26,76 +41,109 @@ if st.button("🔍 Ask", type="primary"):
             st.subheader("📝 Answer")
             answer_placeholder = st.empty()
         
-        # Stream the response
+        # Stream the response; if the connection drops, reconnect with the
+        # last event ID and the backend replays what we missed
         try:
-            response = requests.get(
-                "http://127.0.0.1:8000/chat/stream",
-                params={"query": query},
-                stream=True
-            )
-            
+            session = get_session()
             final_answer = ""
             logs = []
+            last_event_id = None
+            finished = False
+            attempts = 0
             
-            for line in response.iter_lines():
-                if line:
-                    line = line.decode('utf-8')
-                    if line.startswith('data: '):
-                        data = json.loads(line[6:])  # Remove 'data: ' prefix
-                        
-                        event_type = data.get('type')
-                        
-                        if event_type == 'start':
-                            st.toast(data.get('message', 'Starting...'))
-                        
-                        elif event_type == 'agent':
-                            agent = data.get('agent')
-                            status = data.get('status')
-                            message = data.get('message', '')
-                            
-                            if agent == 'Manager':
-                                if status == 'running':
-                                    manager_status.info("🔄 Manager Agent: Creating plan...")
-                                elif status == 'complete':
-                                    manager_status.success(f"✅ Manager Agent: {message}")
-                            
-                            elif agent == 'Research':
-                                if status == 'running':
-                                    research_status.info("🔄 Research Agent: Searching web...")
-                                elif status == 'complete':
-                                    research_status.success(f"✅ Research Agent: {message}")
-                            
-                            elif agent == 'Validation':
-                                if status == 'running':
-                                    validation_status.info("🔄 Validation Agent: Validating facts...")
-                                elif status == 'complete':
-                                    validation_status.success(f"✅ Validation Agent: {message}")
-                            
-                            elif agent == 'Summary':
-                                if status == 'running':
-                                    summary_status.info("🔄 Summary Agent: Generating summary...")
-                                elif status == 'complete':
-                                    summary_status.success(f"✅ Summary Agent: {message}")
-                        
-                        elif event_type == 'summary_start':
-                            final_answer = ""
-                        
-                        elif event_type == 'summary_chunk':
-                            chunk = data.get('content', '')
-                            final_answer += chunk
-                            answer_placeholder.markdown(final_answer)
-                        
-                        elif event_type == 'complete':
-                            final_answer = data.get('final_answer', '')
-                            logs = data.get('logs', [])
-                            answer_placeholder.markdown(final_answer)
-                            
-                            # Show logs in expander
-                            with st.expander("📋 View Agent Logs"):
-                                for log in logs:
-                                    st.text(f"• {log}")
-                            
-                            st.success("✨ Research complete!")
+            while not finished:
+                try:
+                    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+                    response = session.get(
+                        STREAM_URL,
+                        params={"query": query},
+                        headers=headers,
+                        stream=True,
+                        timeout=(5, 120)
+                    )
+                    if response.status_code == 429:
+                        retry_after = response.headers.get("Retry-After", "a few")
+                        st.warning(f"The server is busy, please try again in {retry_after} seconds.")
+                        break
+                    response.raise_for_status()
+
+                    for line in response.iter_lines():
+                        if line:
+                            line = line.decode('utf-8')
+                            if line.startswith('id: '):
+                                last_event_id = line[4:]
+                            elif line.startswith('data: '):
+                                data = json.loads(line[6:])  # Remove 'data: ' prefix
+                                attempts = 0
+
+                                event_type = data.get('type')
+
+                                if event_type == 'start':
+                                    st.toast(data.get('message', 'Starting...'))
+
+                                elif event_type == 'agent':
+                                    agent = data.get('agent')
+                                    status = data.get('status')
+                                    message = data.get('message', '')
+
+                                    if agent == 'Manager':
+                                        if status == 'running':
+                                            manager_status.info("🔄 Manager Agent: Creating plan...")
+                                        elif status == 'complete':
+                                            manager_status.success(f"✅ Manager Agent: {message}")
+
+                                    elif agent == 'Research':
+                                        if status == 'running':
+                                            research_status.info("🔄 Research Agent: Searching web...")
+                                        elif status == 'complete':
+                                            research_status.success(f"✅ Research Agent: {message}")
+
+                                    elif agent == 'Validation':
+                                        if status == 'running':
+                                            validation_status.info("🔄 Validation Agent: Validating facts...")
+                                        elif status == 'complete':
+                                            validation_status.success(f"✅ Validation Agent: {message}")
+
+                                    elif agent == 'Summary':
+                                        if status == 'running':
+                                            summary_status.info("🔄 Summary Agent: Generating summary...")
+                                        elif status == 'complete':
+                                            summary_status.success(f"✅ Summary Agent: {message}")
+
+                                elif event_type == 'summary_start':
+                                    final_answer = ""
+
+                                elif event_type == 'summary_chunk':
+                                    chunk = data.get('content', '')
+                                    final_answer += chunk
+                                    answer_placeholder.markdown(final_answer)
+
+                                elif event_type == 'complete':
+                                    final_answer = data.get('final_answer', '')
+                                    logs = data.get('logs', [])
+                                    answer_placeholder.markdown(final_answer)
+
+                                    # Show logs in expander
+                                    with st.expander("📋 View Agent Logs"):
+                                        for log in logs:
+                                            st.text(f"• {log}")
+
+                                    st.success("✨ Research complete!")
+                                    finished = True
+
+                                elif event_type == 'error':
+                                    st.error(f"Research failed: {data.get('message', 'unknown error')}")
+                                    finished = True
+
+                    if not finished:
+                        raise requests.ConnectionError("Stream ended before the research completed")
+
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                    attempts += 1
+                    if attempts > MAX_RECONNECTS:
+                        raise
+                    st.toast(f"Connection lost, reconnecting ({attempts}/{MAX_RECONNECTS})...")
+                    time.sleep(min(0.5 * 2 ** attempts, 8))
         
         except Exception as e:
             st.error(f"Error: {str(e)}")
@@ -0,0 +1,149 @@
+# PageFetcher against a local HTTP server: byte cap, deadline, revalidation, SSRF refusal
+
+import asyncio
+import ipaddress
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.fetch import PageFetcher
+
+ARTICLE = ("<html><head><title>LangGraph Intro</title><script>var x = 1;</script></head>"
+           "<body><nav>Home | About</nav><article><p>LangGraph builds stateful agents.</p></article>"
+           "<footer>(c) 2024</footer></body></html>").encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", **headers):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in headers.items():
+            self.send_header(name.replace("_", "-"), value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        Handler.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/article":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, ETag='"v1"')
+            else:
+                self._send(200, ARTICLE, ETag='"v1"', Content_Length=str(len(ARTICLE)))
+        elif self.path == "/huge":
+            self._send(200, b"<p>" + b"word " * 200_000 + b"</p>")
+        elif self.path == "/slow":
+            time.sleep(2)
+            self._send(200, b"<p>late</p>")
+        elif self.path.startswith("/redirect?to="):
+            self._send(302, Location=self.path.split("=", 1)[1])
+        else:
+            self._send(404)
+
+
+class FixtureIsPublic(PageFetcher):
+    """Treats the loopback fixture server as if it were on the public internet."""
+
+    @staticmethod
+    def _is_public(address) -> bool:
+        return address.is_global or address == ipaddress.ip_address("127.0.0.1")
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def fetch(fetcher, *urls, deadline=None):
+    async def run():
+        try:
+            return await fetcher.fetch_many(list(urls), deadline=deadline)
+        finally:
+            await fetcher.aclose()
+    return asyncio.run(run())
+
+
+def test_extracts_main_text(server):
+    page = fetch(PageFetcher(allow_private=True), server + "/article")[server + "/article"]
+    assert page["title"] == "LangGraph Intro"
+    assert page["text"] == "LangGraph builds stateful agents."
+
+
+def test_byte_cap(server):
+    fetcher = PageFetcher(allow_private=True, max_bytes=16 * 1024, max_chars=10**6)
+    page = fetch(fetcher, server + "/huge")[server + "/huge"]
+    assert fetcher.counters["truncated"] == 1
+    assert fetcher.counters["bytes"] == 16 * 1024
+    assert len(page["text"]) < 16 * 1024
+
+
+def test_deadline_cancels_slow_pages(server):
+    fetcher = PageFetcher(allow_private=True)
+    started = time.monotonic()
+    pages = fetch(fetcher, server + "/slow", server + "/article", deadline=0.5)
+    assert time.monotonic() - started < 1.5
+    assert list(pages) == [server + "/article"]
+    assert fetcher.counters["timed_out"] == 1
+
+
+def test_revalidates_with_etag(server):
+    fetcher = PageFetcher(allow_private=True)
+    first = fetch(fetcher, server + "/article")
+    Handler.requests.clear()
+    second = fetch(fetcher, server + "/article")
+    assert second == first
+    assert Handler.requests == [("/article", '"v1"')]
+    assert fetcher.counters["not_modified"] == 1
+
+
+def test_refuses_private_hosts(server):
+    fetcher = PageFetcher(allow_private=False)
+    assert fetch(fetcher, server + "/article") == {}
+    assert fetch(fetcher, "http://localhost/", "http://169.254.169.254/latest/meta-data") == {}
+
+
+@pytest.mark.parametrize("target", ["http://169.254.169.254/latest/meta-data", "http://10.0.0.1/",
+                                    "http://localhost/admin"])
+def test_refuses_redirect_to_private_host(server, target):
+    fetcher = FixtureIsPublic(allow_private=False)
+    Handler.requests.clear()
+    assert fetch(fetcher, f"{server}/redirect?to={target}") == {}
+    assert fetcher.counters["refused"] == 1
+    assert [path for path, _ in Handler.requests] == [f"/redirect?to={target}"]
+
+
+def test_follows_redirect_to_public_host(server):
+    fetcher = FixtureIsPublic(allow_private=False)
+    pages = fetch(fetcher, f"{server}/redirect?to=/article")
+    assert pages[f"{server}/redirect?to=/article"]["title"] == "LangGraph Intro"
+
+
+def test_refuses_names_resolving_to_private_addresses():
+    class InternalDns(PageFetcher):
+        async def _resolve(self, host, port):
+            return ["10.1.2.3"] if host == "intranet.example.com" else ["93.184.216.34"]
+
+    fetcher = InternalDns(allow_private=False)
+    assert not asyncio.run(fetcher.permitted("http://intranet.example.com/"))
+    assert asyncio.run(fetcher.permitted("https://example.com/"))
+
+
+def test_host_limiters_are_bounded(monkeypatch):
+    monkeypatch.setattr("backend.config.FETCH_MAX_HOSTS", 4)
+    fetcher = PageFetcher()
+
+    async def run():
+        for n in range(10):
+            async with fetcher._host_slot(f"http://host{n}.example.com/"):
+                pass
+    asyncio.run(run())
+    assert list(fetcher._hosts) == [f"host{n}.example.com" for n in range(6, 10)]